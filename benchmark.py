@@ -0,0 +1,277 @@
+# Offline benchmark for the scrape, store, search and dashboard stages of my_data_app.
+# Pages are synthesized with the dakar-auto card markup the scrapers parse and tables
+# are grown from the bundled data/*.csv exports, so no network access is needed.
+#
+#   python benchmark.py                                # writes benchmark_results.json
+#   python benchmark.py --pages 1 10 --rows 10000      # quicker run
+#   python benchmark.py --compare baseline.json        # exit 1 on a regression
+import argparse
+import json
+import logging
+import os
+import platform
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+WORKDIR = tempfile.mkdtemp(prefix='dakar_auto_bench_')
+os.environ['DAKAR_AUTO_DB'] = os.path.join(WORKDIR, 'bench.db')
+os.environ['DAKAR_AUTO_CACHE'] = os.path.join(WORKDIR, 'http_cache')
+os.environ['DAKAR_AUTO_METRICS'] = os.path.join(WORKDIR, 'dakar_auto.prom')
+# Stages time the queries themselves; the shared result cache is timed separately
+os.environ['DAKAR_AUTO_RESULT_CACHE_MB'] = '0'
+
+import pandas as pd
+
+# Importing the app runs its page script in Streamlit's bare mode, which warns on every call
+logging.disable(logging.WARNING)
+import my_data_app as app
+
+CATEGORIES = ('voitures', 'motos', 'location')
+CARDS_PER_PAGE = 20
+DEFAULT_PAGES = (1, 10, 50)
+DEFAULT_ROWS = (10000, 100000, 1000000)
+SEARCH_TERMS = ('toyota', 'dakar', 'rose diompy')
+
+CARD = '''<div class="listings-cards__list-item mb-md-3 mb-3">
+ <div class="listing-card"><div class="row">
+  <div class="col-4"><a href="/senegal/annonce-{ref}"><img src="/img/{ref}.jpg" alt="{title}"></a></div>
+  <div class="col-8">
+   <h2 class="listing-card__header__title mb-md-2 mb-0"><a href="/senegal/annonce-{ref}">{title}</a></h2>
+   <h3 class="listing-card__header__price font-weight-bold text-uppercase mb-0">{price} F CFA</h3>
+   <ul class="listing-card__attribute-list list-inline mb-0">
+    <li class="listing-card__attribute list-inline-item">Ref: {ref}</li>
+    <li class="listing-card__attribute list-inline-item">{kilometer} km</li>
+    <li class="listing-card__attribute list-inline-item">{gearbox}</li>
+    <li class="listing-card__attribute list-inline-item">{fuel_type}</li>
+   </ul>
+   <div class="row"><div class="col-12 entry-zone-address">{adress}</div></div>
+   <p class="time-author m-0">Il y a 2 jours Par <a href="/profil/{ref}">{owner}</a></p>
+  </div></div></div>
+</div>'''
+
+PAGE = '''<html><head><title>Dakar Auto</title></head><body>
+<nav><ul>{nav}</ul></nav>
+<div class="listings-cards">{cards}</div>
+<footer><ul>{nav}</ul></footer>
+</body></html>'''
+
+NAV = ''.join(f'<li><a href="/senegal/categorie-{i}">Categorie {i}</a></li>' for i in range(100))
+
+def text(value, default=''):
+    return default if pd.isna(value) else str(value)
+
+def group_digits(value):
+    return f"{int(value):,}".replace(',', ' ') if pd.notna(value) else ''
+
+def synthesize_page(rows, page):
+    cards = []
+    for offset, row in enumerate(rows.itertuples(index=False)):
+        title = " ".join(part for part in (text(row.brand), text(getattr(row, 'model', '')), text(row.year)) if part)
+        cards.append(CARD.format(
+            ref=page * 1000 + offset,
+            title=title,
+            price=group_digits(row.price),
+            kilometer=text(getattr(row, 'kilometer', 0), '0'),
+            gearbox=text(getattr(row, 'gearbox', 'Manuelle'), 'Manuelle'),
+            fuel_type=text(getattr(row, 'fuel_type', 'Essence'), 'Essence'),
+            adress=text(row.adress, 'Dakar'),
+            owner=text(row.owner),
+        ))
+    return PAGE.format(nav=NAV, cards=''.join(cards)).encode('utf-8')
+
+def synthesize_pages(category, num_pages):
+    # Cycle through the bundled export so every card carries real listing values
+    base = app.load_bundled_export(category)
+    pages = []
+    for page in range(1, num_pages + 1):
+        positions = [((page - 1) * CARDS_PER_PAGE + i) % len(base) for i in range(CARDS_PER_PAGE)]
+        pages.append(synthesize_page(base.iloc[positions], page))
+    return pages
+
+def synthesize_table(category, num_rows):
+    # Repeat the bundled export up to num_rows, making every copy a distinct listing
+    base = app.load_bundled_export(category)
+    fields = [name for name, _, _, _ in app.LISTING_SPECS[category]['fields']]
+    df = base.iloc[[i % len(base) for i in range(num_rows)]][fields].reset_index(drop=True)
+    copy = pd.Series(range(num_rows)) // len(base)
+    df['owner'] = df['owner'].astype('string') + ' ' + copy.astype('string')
+    df['price'] = (df['price'] + (copy % 100) * 1000).astype('Int64')
+    df = app.normalize_numeric_columns(df)
+    df['listing_key'] = app.listing_keys(df, app.LISTING_SPECS[category]['key'])
+    return app.distinct_listings(df)
+
+def timed(fn, repeat):
+    times = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return times, result
+
+def record(results, stage, category, size, times, rows=None):
+    entry = {
+        'stage': stage,
+        'category': category,
+        'size': size,
+        'repeat': len(times),
+        'min': min(times),
+        'median': statistics.median(times),
+        'mean': statistics.mean(times),
+        'rows': rows,
+    }
+    results.append(entry)
+    print(f"{stage:<26} {category:<9} {size:>8}  median {entry['median'] * 1000:10.2f} ms  min {entry['min'] * 1000:10.2f} ms",
+          flush=True)
+
+STARTUP_SCRIPT = '''
+import logging, sys, time
+import streamlit, pandas
+logging.disable(logging.WARNING)
+sys.path.insert(0, {path!r})
+start = time.perf_counter()
+import my_data_app
+print(time.perf_counter() - start)
+'''
+
+def bench_startup(results, repeat):
+    # Cold start: a fresh interpreter importing the app once streamlit and pandas are loaded,
+    # which is what the first session of a new server process pays on top of the framework
+    script = STARTUP_SCRIPT.format(path=os.path.dirname(os.path.abspath(app.__file__)))
+    times = []
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, check=True)
+        times.append(float(out.stdout.strip().splitlines()[-1]))
+    record(results, 'startup.cold', 'app', 1, times)
+
+    # Rerun: Streamlit re-executes the compiled page script on every widget interaction
+    with open(app.__file__) as f:
+        code = compile(f.read(), app.__file__, 'exec')
+    times, _ = timed(lambda: exec(code, {'__name__': '__main__', '__file__': app.__file__}), repeat)
+    record(results, 'startup.rerun', 'app', 1, times)
+
+def bench_scrape(results, category, page_counts, repeat):
+    scrape = getattr(app, f'scrape_{category}')
+    fields = app.LISTING_SPECS[category]['fields']
+    for num_pages in page_counts:
+        pages = synthesize_pages(category, num_pages)
+        times, parsed = timed(lambda: [app.parse_listing_page(page, fields) for page in pages], repeat)
+        record(results, 'parse', category, num_pages, times, sum(len(page) for page in parsed))
+
+        # The full scrape_* path, replaying the synthesized pages from the page cache
+        urls = [app.LISTING_SPECS[category]['url'].format(page=page) for page in range(1, num_pages + 1)]
+        for url, page in zip(urls, pages):
+            app.cache_store(url, page)
+        times, df = timed(lambda: scrape(num_pages, cache_mode=app.CACHE_REPLAY), repeat)
+        record(results, 'scrape', category, num_pages, times, len(df))
+
+def bench_store(results, category, row_counts, repeat):
+    for num_rows in row_counts:
+        df = synthesize_table(category, num_rows)
+        app.clear_table(category)
+        # First write inserts every row, the second takes the upsert path
+        times, _ = timed(lambda: app.save_to_db(df.copy(), category), 1)
+        record(results, 'save_to_db.insert', category, num_rows, times, num_rows)
+        times, _ = timed(lambda: app.save_to_db(df.copy(), category), 1)
+        record(results, 'save_to_db.upsert', category, num_rows, times, num_rows)
+
+        times, loaded = timed(lambda: app.load_from_db(category), repeat)
+        record(results, 'load_from_db', category, num_rows, times, len(loaded))
+        del loaded
+
+        for term in SEARCH_TERMS:
+            times, found = timed(lambda: app.search_listings(category, term), repeat)
+            record(results, f'search[{term}]', category, num_rows, times, len(found))
+
+        times, _ = timed(lambda: app.dashboard_metrics(category), repeat)
+        record(results, 'dashboard.metrics', category, num_rows, times)
+        times, _ = timed(lambda: app.top_brands(category), repeat)
+        record(results, 'dashboard.top_brands', category, num_rows, times)
+        times, _ = timed(lambda: app.year_counts(category), repeat)
+        record(results, 'dashboard.year_counts', category, num_rows, times)
+        times, _ = timed(lambda: app.price_histogram(category), repeat)
+        record(results, 'dashboard.price_histogram', category, num_rows, times)
+
+        # Sidebar facet counts and every Dashboard query under a brand and year-range selection
+        fields = [name for name, _, _, _ in app.LISTING_SPECS[category]['fields']]
+        filters = (('brand', (app.top_brands(category, 1)['brand'][0],)), ('year', (2010, None)))
+        times, _ = timed(lambda: [app.facet_counts(category, column, filters)
+                                  for column in app.FACET_LABELS if column in fields], repeat)
+        record(results, 'dashboard.facets', category, num_rows, times)
+        times, _ = timed(lambda: (app.dashboard_metrics(category, filters), app.top_brands(category, 10, filters),
+                                  app.year_counts(category, filters), app.price_histogram(category, None, 0.0, filters)),
+                         repeat)
+        record(results, 'dashboard.filtered', category, num_rows, times)
+        
+        # Every Dashboard query again, served from the shared result cache after one miss
+        app.RESULT_CACHE_BYTES = 256 * 1024 * 1024
+        dashboard = lambda: (app.dashboard_metrics(category), app.top_brands(category),
+                             app.year_counts(category), app.price_histogram(category))
+        dashboard()
+        times, _ = timed(dashboard, repeat)
+        record(results, 'dashboard.cached', category, num_rows, times)
+        app.RESULT_CACHE_BYTES = 0
+    app.clear_table(category)
+
+def compare(results, baseline_path, threshold):
+    # Flag every stage whose median got slower than the baseline by more than threshold
+    with open(baseline_path) as f:
+        baseline = {(r['stage'], r['category'], r['size']): r for r in json.load(f)['results']}
+    regressions = []
+    for entry in results:
+        before = baseline.get((entry['stage'], entry['category'], entry['size']))
+        if before is None or before['median'] <= 0:
+            continue
+        change = entry['median'] / before['median'] - 1
+        if change > threshold:
+            regressions.append((entry, before, change))
+    for entry, before, change in regressions:
+        print(f"REGRESSION {entry['stage']} {entry['category']} {entry['size']}: "
+              f"{before['median'] * 1000:.2f} ms -> {entry['median'] * 1000:.2f} ms (+{change:.0%})")
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline benchmark for my_data_app")
+    parser.add_argument('--categories', nargs='+', choices=CATEGORIES, default=list(CATEGORIES))
+    parser.add_argument('--pages', nargs='+', type=int, default=list(DEFAULT_PAGES))
+    parser.add_argument('--rows', nargs='+', type=int, default=list(DEFAULT_ROWS))
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--compare', help="baseline results file to check for regressions")
+    parser.add_argument('--threshold', type=float, default=0.2, help="allowed slowdown of a median, 0.2 = 20%%")
+    args = parser.parse_args(argv)
+
+    results = []
+    try:
+        bench_startup(results, args.repeat)
+        for category in args.categories:
+            bench_scrape(results, category, args.pages, args.repeat)
+        for category in args.categories:
+            bench_store(results, category, args.rows, args.repeat)
+    finally:
+        shutil.rmtree(WORKDIR, ignore_errors=True)
+
+    report = {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'pandas': pd.__version__,
+        'platform': platform.platform(),
+        'results': results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.compare and compare(results, args.compare, args.threshold):
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,11 +1,30 @@
 import streamlit as st
 import pandas as pd
 import sqlite3
-from requests import get
-from bs4 import BeautifulSoup as bs
-import plotly.express as px
-import plotly.graph_objects as go
-from datetime import datetime
+import os
+import io
+import json
+import hashlib
+import math
+import re
+import threading
+import queue
+import itertools
+import bisect
+import time
+import random
+import functools
+import gzip
+import pyarrow as pa
+from datetime import datetime, timedelta
+from collections import deque, OrderedDict
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin, urlsplit
+
+# requests, lxml, plotly and the pyarrow dataset/parquet modules are imported inside the
+# functions and pages that use them, so a session that never scrapes or charts does not
+# pay for loading them at startup
 
 # Page configuration
 st.set_page_config(
@@ -102,195 +121,2128 @@ div[data-testid="stDataFrame"] td {
 </style>
 """, unsafe_allow_html=True)
 
+# Metrics: stage timings, latency histograms and row counts shared by every session
+METRICS_PATH = os.environ.get('DAKAR_AUTO_METRICS', 'dakar_auto.prom')
+METRICS_FLUSH_INTERVAL = 15
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+METRIC_HELP = {
+    'dakar_auto_fetch_seconds': ('histogram', "Listing page fetch latency, by where the page came from"),
+    'dakar_auto_query_seconds': ('histogram', "SQLite query latency"),
+    'dakar_auto_query_errors_total': ('counter', "SQLite queries that failed, by query"),
+    'dakar_auto_stage_seconds': ('histogram', "Scrape, storage and Dashboard chart stage latency"),
+    'dakar_auto_fetch_bytes_total': ('counter', "Listing page bytes fetched"),
+    'dakar_auto_fetch_errors_total': ('counter', "Listing page fetch attempts that failed"),
+    'dakar_auto_rows_total': ('counter', "Rows handled by each stage"),
+    'dakar_auto_result_cache_total': ('counter', "Shared result cache lookups, by function and hit or miss"),
+}
+
+@st.cache_resource
+def get_metrics():
+    # Process-wide, so background jobs and every browser session report into one registry
+    return {'lock': threading.Lock(), 'histograms': {}, 'counters': {}, 'flushed_at': 0.0}
+
+def observe(name, seconds, **labels):
+    metrics = get_metrics()
+    key = (name, tuple(sorted(labels.items())))
+    with metrics['lock']:
+        series = metrics['histograms'].get(key)
+        if series is None:
+            # One slot per bucket plus an overflow slot for +Inf
+            series = metrics['histograms'][key] = {'buckets': [0] * (len(LATENCY_BUCKETS) + 1), 'sum': 0.0, 'count': 0}
+        series['buckets'][bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        series['sum'] += seconds
+        series['count'] += 1
+    flush_metrics()
+
+def increment(name, value=1, **labels):
+    metrics = get_metrics()
+    key = (name, tuple(sorted(labels.items())))
+    with metrics['lock']:
+        metrics['counters'][key] = metrics['counters'].get(key, 0) + value
+
+@contextmanager
+def timed(name, **labels):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start, **labels)
+
+def histogram_quantile(q, buckets, total):
+    # Linear interpolation inside the bucket holding the q-th observation, as Prometheus does
+    rank = q * total
+    cumulative = 0
+    lower = 0.0
+    for bound, hits in zip(LATENCY_BUCKETS, buckets):
+        if hits and cumulative + hits >= rank:
+            return lower + (bound - lower) * (rank - cumulative) / hits
+        cumulative += hits
+        lower = bound
+    return LATENCY_BUCKETS[-1]
+
+def metrics_snapshot():
+    metrics = get_metrics()
+    with metrics['lock']:
+        histograms = {key: dict(series, buckets=list(series['buckets'])) for key, series in metrics['histograms'].items()}
+        counters = dict(metrics['counters'])
+    return histograms, counters
+
+def format_labels(labels):
+    if not labels:
+        return ""
+    pairs = ",".join('{}="{}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"')) for name, value in labels)
+    return "{" + pairs + "}"
+
+def prometheus_text():
+    histograms, counters = metrics_snapshot()
+    lines = []
+    for name, (kind, help_text) in METRIC_HELP.items():
+        series = histograms if kind == 'histogram' else counters
+        keys = sorted(key for key in series if key[0] == name)
+        if not keys:
+            continue
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for key in keys:
+            labels = key[1]
+            if kind == 'counter':
+                lines.append(f"{name}{format_labels(labels)} {series[key]}")
+                continue
+            cumulative = 0
+            for bound, hits in zip(LATENCY_BUCKETS, series[key]['buckets']):
+                cumulative += hits
+                lines.append(f"{name}_bucket{format_labels(labels + (('le', bound),))} {cumulative}")
+            lines.append(f"{name}_bucket{format_labels(labels + (('le', '+Inf'),))} {series[key]['count']}")
+            lines.append(f"{name}_sum{format_labels(labels)} {series[key]['sum']}")
+            lines.append(f"{name}_count{format_labels(labels)} {series[key]['count']}")
+    return "\n".join(lines) + "\n"
+
+def write_metrics_file(path=METRICS_PATH):
+    # Written to a temp file and renamed, so the node exporter textfile collector never reads half a file
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    # One temp file per process and thread: the Performance page and job workers write concurrently
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'w') as f:
+        f.write(prometheus_text())
+    os.replace(tmp_path, path)
+
+def flush_metrics():
+    metrics = get_metrics()
+    now = time.time()
+    with metrics['lock']:
+        if now - metrics['flushed_at'] < METRICS_FLUSH_INTERVAL:
+            return
+        metrics['flushed_at'] = now
+    try:
+        write_metrics_file()
+    except OSError:
+        pass
+
+def reset_metrics():
+    metrics = get_metrics()
+    with metrics['lock']:
+        metrics['histograms'].clear()
+        metrics['counters'].clear()
+
+def metrics_frames():
+    histograms, counters = metrics_snapshot()
+    latency = pd.DataFrame([
+        {
+            'metric': name,
+            'labels': ", ".join(f"{label}={value}" for label, value in labels),
+            'count': series['count'],
+            'total_s': round(series['sum'], 3),
+            'mean_ms': round(series['sum'] / series['count'] * 1000, 2),
+            'p50_ms': round(histogram_quantile(0.5, series['buckets'], series['count']) * 1000, 2),
+            'p95_ms': round(histogram_quantile(0.95, series['buckets'], series['count']) * 1000, 2),
+        }
+        for (name, labels), series in sorted(histograms.items()) if series['count']
+    ])
+    rows = pd.DataFrame([
+        {'metric': name, 'labels': ", ".join(f"{label}={value}" for label, value in labels), 'value': value}
+        for (name, labels), value in sorted(counters.items())
+    ])
+    return latency, rows, histograms
+
 # Database functions
-def init_db():
-    conn = sqlite3.connect('daka_auto.db')
-    c = conn.cursor()
-    
+DB_PATH = os.environ.get('DAKAR_AUTO_DB', 'daka_auto.db')
+DB_POOL_SIZE = 8
+WRITE_BATCH_SIZE = 1000
+
+def open_connection(path):
+    # WAL lets dashboard readers keep reading while a scraper writes
+    conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.execute("PRAGMA cache_size = -65536")
+    conn.execute("PRAGMA mmap_size = 268435456")
+    conn.execute("PRAGMA temp_store = MEMORY")
+    return conn
+
+@st.cache_resource
+def get_db_pool(path):
+    # Idle connections shared across reruns, sessions and worker threads
+    return queue.LifoQueue()
+
+@contextmanager
+def db_connection(path=DB_PATH):
+    pool = get_db_pool(path)
+    try:
+        conn = pool.get_nowait()
+    except queue.Empty:
+        conn = open_connection(path)
+    try:
+        yield conn
+    finally:
+        if conn.in_transaction:
+            conn.rollback()
+        if pool.qsize() < DB_POOL_SIZE:
+            pool.put(conn)
+        else:
+            conn.close()
+
+# Shared result cache: query results and aggregates are kept once per process for every
+# session, keyed by the table's write version. Writers bump the version after committing,
+# so a read never returns data older than the last write. Cached results are shared
+# between sessions and must be treated as read-only.
+RESULT_CACHE_ENTRIES = 256
+RESULT_CACHE_BYTES = int(os.environ.get('DAKAR_AUTO_RESULT_CACHE_MB', '256')) * 1024 * 1024
+
+@st.cache_resource
+def get_result_cache():
+    return {'lock': threading.Lock(), 'entries': OrderedDict(), 'bytes': 0, 'versions': {}}
+
+def bump_write_version(table_name):
+    cache = get_result_cache()
+    with cache['lock']:
+        cache['versions'][table_name] = cache['versions'].get(table_name, 0) + 1
+        # Entries of the older versions can never be hit again
+        for key in [key for key in cache['entries'] if key[1] == table_name]:
+            cache['bytes'] -= cache['entries'].pop(key)[1]
+
+def result_size(value):
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, tuple):
+        return sum(result_size(item) for item in value)
+    if isinstance(value, bytes):
+        return len(value)
+    return 1024
+
+def shared_result(fn):
+    # Caches fn(table_name, ...) until table_name is next written, evicting the least
+    # recently used entries beyond RESULT_CACHE_ENTRIES or RESULT_CACHE_BYTES
+    @functools.wraps(fn)
+    def cached(table_name, *args, **kwargs):
+        cache = get_result_cache()
+        with cache['lock']:
+            key = (fn.__name__, table_name, cache['versions'].get(table_name, 0), args, tuple(sorted(kwargs.items())))
+            entry = cache['entries'].get(key)
+            if entry is not None:
+                cache['entries'].move_to_end(key)
+        if entry is not None:
+            increment('dakar_auto_result_cache_total', function=fn.__name__, result='hit')
+            return entry[0]
+        
+        increment('dakar_auto_result_cache_total', function=fn.__name__, result='miss')
+        value = fn(table_name, *args, **kwargs)
+        size = result_size(value)
+        if size > RESULT_CACHE_BYTES:
+            return value
+        with cache['lock']:
+            if key not in cache['entries']:
+                cache['entries'][key] = (value, size)
+                cache['bytes'] += size
+            while len(cache['entries']) > RESULT_CACHE_ENTRIES or cache['bytes'] > RESULT_CACHE_BYTES:
+                cache['bytes'] -= cache['entries'].popitem(last=False)[1][1]
+        return value
+    return cached
+
+TABLE_SCHEMAS = {
     # Table for cars
-    c.execute('''CREATE TABLE IF NOT EXISTS voitures
+    'voitures': '''CREATE TABLE IF NOT EXISTS voitures
                  (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                  brand TEXT, model TEXT, year TEXT, kilometer TEXT,
+                  brand TEXT, model TEXT, year INTEGER, kilometer INTEGER,
                   fuel_type TEXT, gearbox TEXT, adress TEXT,
-                  owner TEXT, price TEXT, scraped_date TEXT)''')
+                  owner TEXT, price INTEGER, scraped_date TEXT,
+                  listing_key TEXT, first_seen TEXT, last_seen TEXT,
+                  price_raw TEXT, year_raw TEXT, kilometer_raw TEXT,
+                  block_key TEXT, canonical_id INTEGER, url TEXT, location_id INTEGER)''',
     
     # Table for motos
-    c.execute('''CREATE TABLE IF NOT EXISTS motos
+    'motos': '''CREATE TABLE IF NOT EXISTS motos
                  (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                  brand TEXT, year TEXT, kilometer TEXT,
-                  adress TEXT, owner TEXT, price TEXT, scraped_date TEXT)''')
+                  brand TEXT, model TEXT, year INTEGER, kilometer INTEGER,
+                  adress TEXT, owner TEXT, price INTEGER, scraped_date TEXT,
+                  listing_key TEXT, first_seen TEXT, last_seen TEXT,
+                  price_raw TEXT, year_raw TEXT, kilometer_raw TEXT,
+                  block_key TEXT, canonical_id INTEGER, url TEXT, location_id INTEGER)''',
     
     # Table for car rental
-    c.execute('''CREATE TABLE IF NOT EXISTS location
+    'location': '''CREATE TABLE IF NOT EXISTS location
                  (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                  brand TEXT, year TEXT, adress TEXT,
-                  owner TEXT, price TEXT, scraped_date TEXT)''')
+                  brand TEXT, model TEXT, year INTEGER, adress TEXT,
+                  owner TEXT, price INTEGER, scraped_date TEXT,
+                  listing_key TEXT, first_seen TEXT, last_seen TEXT,
+                  price_raw TEXT, year_raw TEXT,
+                  block_key TEXT, canonical_id INTEGER, url TEXT, location_id INTEGER)''',
     
-    conn.commit()
-    conn.close()
+    # Background scrape jobs
+    'jobs': '''CREATE TABLE IF NOT EXISTS jobs
+                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                  category TEXT, num_pages INTEGER, options TEXT,
+                  status TEXT, pages_done INTEGER, rows INTEGER, error TEXT,
+                  created_at TEXT, started_at TEXT, finished_at TEXT)''',
+    
+    # Crawl checkpoints: one row per finished or failed page of a job
+    'crawl_pages': '''CREATE TABLE IF NOT EXISTS crawl_pages
+                 (job_id INTEGER, page INTEGER, status TEXT, attempts INTEGER,
+                  rows INTEGER, records TEXT, error TEXT, finished_at TEXT,
+                  PRIMARY KEY (job_id, page))''',
+    
+    # Address dimension: one row per normalised (neighborhood, city), referenced by location_id
+    'locations': '''CREATE TABLE IF NOT EXISTS locations
+                 (id INTEGER PRIMARY KEY AUTOINCREMENT, neighborhood TEXT, city TEXT,
+                  UNIQUE (neighborhood, city))''',
+    
+    # Detail-page fields of each listing, queued as 'pending' when the listing is first saved
+    'listing_details': '''CREATE TABLE IF NOT EXISTS listing_details
+                 (category TEXT, listing_key TEXT, url TEXT, status TEXT,
+                  reference TEXT, posted_at TEXT, specs TEXT, description TEXT,
+                  error TEXT, fetched_at TEXT,
+                  PRIMARY KEY (category, listing_key))''',
+}
+
+@st.cache_resource
+def init_db(path=DB_PATH):
+    # Runs once per server process instead of on every rerun; a database already
+    # at SCHEMA_VERSION skips the CREATE statements and the migrations entirely
+    with db_connection(path) as conn:
+        if conn.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION:
+            return SCHEMA_VERSION
+        c = conn.cursor()
+        for schema in TABLE_SCHEMAS.values():
+            c.execute(schema)
+        conn.commit()
+        migrate_db(conn)
+    return SCHEMA_VERSION
+
+def table_columns(conn, table_name):
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table_name})")]
+
+def backfill_listing_keys(conn, table_name, key_fields):
+    # (Re)compute every listing key. Rows agreeing on the key and on the price are copies
+    # of one card saved by several scrapes; they collapse onto the newest row, keeping the
+    # earliest first_seen and the latest last_seen. Rows sharing a key at another price
+    # may be distinct listings that older schemas cannot tell apart, so none of them is
+    # deleted: the newest owns the key and the others get a key salted with their price.
+    columns = table_columns(conn, table_name)
+    fields = [field for field in key_fields if field in columns] + [field for field in ('url',) if field in columns]
+    rows = conn.execute(
+        f"SELECT id, COALESCE(first_seen, scraped_date), COALESCE(last_seen, scraped_date), price, "
+        f"{', '.join(fields)} FROM {table_name} ORDER BY id"
+    ).fetchall()
+    groups, newest = {}, {}
+    for row in rows:
+        key = listing_key(dict(zip(fields, row[4:])), key_fields)
+        group = groups.setdefault((key, row[3]), [row[1], row[2], row[0]])
+        group[1], group[2] = row[2], row[0]
+        newest[key] = row[3]
+    
+    updates = []
+    for (key, price), (first_seen, last_seen, row_id) in groups.items():
+        if newest[key] != price:
+            key = price_salted_key(key, price)
+        updates.append((key, first_seen, last_seen, row_id))
+    conn.execute(f"UPDATE {table_name} SET listing_key = NULL")
+    conn.executemany(f"UPDATE {table_name} SET listing_key = ?, first_seen = ?, last_seen = ? WHERE id = ?", updates)
+    conn.execute(f"DELETE FROM {table_name} WHERE listing_key IS NULL")
+
+def migrate_listing_keys(conn):
+    # v1: every listing gets a stable key with a unique index, so re-crawls upsert
+    # instead of appending. Legacy duplicates collapse onto their newest row.
+    for table_name, spec in LISTING_SPECS.items():
+        columns = table_columns(conn, table_name)
+        for column in ('listing_key', 'first_seen', 'last_seen'):
+            if column not in columns:
+                conn.execute(f"ALTER TABLE {table_name} ADD COLUMN {column} TEXT")
+        backfill_listing_keys(conn, table_name, spec['key'])
+        conn.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS idx_{table_name}_listing_key ON {table_name}(listing_key)")
+
+def migrate_numeric_columns(conn):
+    # v2: price, year and kilometer become INTEGER columns, with the scraped text kept
+    # in <field>_raw. SQLite cannot change a column type, so old tables are rebuilt.
+    for table_name, spec in LISTING_SPECS.items():
+        column_types = {row[1]: row[2] for row in conn.execute(f"PRAGMA table_info({table_name})")}
+        if column_types.get('price') == 'INTEGER':
+            continue
+        
+        conn.execute(f"ALTER TABLE {table_name} RENAME TO {table_name}_v1")
+        conn.execute(TABLE_SCHEMAS[table_name])
+        new_columns = table_columns(conn, table_name)
+        copied = [column for column in column_types if column in new_columns]
+        inserted = copied + [f'{field}_raw' for field in NUMERIC_FIELDS if field in copied]
+        rows = (
+            normalize_numeric(dict(zip(copied, row)))
+            for row in conn.execute(f"SELECT {', '.join(copied)} FROM {table_name}_v1").fetchall()
+        )
+        conn.executemany(
+            f"INSERT INTO {table_name} ({', '.join(inserted)}) VALUES ({', '.join('?' for _ in inserted)})",
+            ([record[column] for column in inserted] for record in rows)
+        )
+        conn.execute(f"DROP TABLE {table_name}_v1")
+        backfill_listing_keys(conn, table_name, spec['key'])
+        conn.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS idx_{table_name}_listing_key ON {table_name}(listing_key)")
+
+def migrate_dashboard_indexes(conn):
+    # v3: indexes backing the Dashboard aggregations (COUNT DISTINCT, GROUP BY, AVG, MAX)
+    for table_name in LISTING_SPECS:
+        for column in ('brand', 'year', 'price'):
+            conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table_name}_{column} ON {table_name}({column})")
+
+FTS_COLUMNS = ('brand', 'model', 'adress', 'owner')
+
+def migrate_search_index(conn):
+    # v4: FTS5 index over the text columns of each table, kept in sync by triggers.
+    # SQLite builds without FTS5 skip it and search falls back to LIKE.
+    for table_name in LISTING_SPECS:
+        columns = [column for column in FTS_COLUMNS if column in table_columns(conn, table_name)]
+        column_list = ', '.join(columns)
+        new_values = ', '.join(f'new.{column}' for column in columns)
+        old_values = ', '.join(f'old.{column}' for column in columns)
+        try:
+            conn.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {table_name}_fts USING fts5("
+                f"{column_list}, content='{table_name}', content_rowid='id', "
+                f"tokenize='unicode61 remove_diacritics 2')"
+            )
+        except sqlite3.OperationalError:
+            return
+        conn.executescript(f'''
+            CREATE TRIGGER IF NOT EXISTS {table_name}_fts_insert AFTER INSERT ON {table_name} BEGIN
+                INSERT INTO {table_name}_fts(rowid, {column_list}) VALUES (new.id, {new_values});
+            END;
+            CREATE TRIGGER IF NOT EXISTS {table_name}_fts_delete AFTER DELETE ON {table_name} BEGIN
+                INSERT INTO {table_name}_fts({table_name}_fts, rowid, {column_list}) VALUES ('delete', old.id, {old_values});
+            END;
+            CREATE TRIGGER IF NOT EXISTS {table_name}_fts_update AFTER UPDATE OF {column_list} ON {table_name} BEGIN
+                INSERT INTO {table_name}_fts({table_name}_fts, rowid, {column_list}) VALUES ('delete', old.id, {old_values});
+                INSERT INTO {table_name}_fts(rowid, {column_list}) VALUES (new.id, {new_values});
+            END;
+        ''')
+        conn.execute(f"INSERT INTO {table_name}_fts({table_name}_fts) VALUES ('rebuild')")
+
+def migrate_browse_indexes(conn):
+    # v5: every sortable View Data column is indexed for keyset pagination
+    for table_name in LISTING_SPECS:
+        columns = table_columns(conn, table_name)
+        for column in SORTABLE_COLUMNS:
+            if column in columns and column != 'id':
+                conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table_name}_{column} ON {table_name}({column})")
+
+def migrate_job_tables(conn):
+    # v6: the jobs and crawl_pages tables, which older databases only got from
+    # init_db re-running every CREATE statement on each rerun
+    conn.execute(TABLE_SCHEMAS['jobs'])
+    conn.execute(TABLE_SCHEMAS['crawl_pages'])
+
+def migrate_duplicate_links(conn):
+    # v7: blocking key and canonical listing id for near-duplicate detection,
+    # backfilled over the existing rows in id order
+    for table_name in LISTING_SPECS:
+        columns = table_columns(conn, table_name)
+        if 'block_key' not in columns:
+            conn.execute(f"ALTER TABLE {table_name} ADD COLUMN block_key TEXT")
+        if 'canonical_id' not in columns:
+            conn.execute(f"ALTER TABLE {table_name} ADD COLUMN canonical_id INTEGER")
+        fields = [field for field in BLOCK_FIELDS if field in columns]
+        df = pd.read_sql_query(f"SELECT id, {', '.join(fields)} FROM {table_name}", conn)
+        conn.executemany(
+            f"UPDATE {table_name} SET block_key = ?, canonical_id = NULL WHERE id = ?",
+            zip(block_keys(df).tolist(), df['id'].tolist())
+        )
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table_name}_block_key ON {table_name}(block_key)")
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table_name}_canonical_id ON {table_name}(canonical_id)")
+        link_duplicates(conn, table_name)
+
+def migrate_storage_maintenance(conn):
+    # v8: scraped_date index for range queries, and incremental auto-vacuum so
+    # maintenance can hand freed pages back to the filesystem. Switching auto_vacuum
+    # on an existing database only takes effect after one full VACUUM.
+    for table_name in LISTING_SPECS:
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table_name}_scraped_date ON {table_name}(scraped_date)")
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+        conn.commit()
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("VACUUM")
+
+def migrate_listing_details(conn):
+    # v9: the detail page url of every listing, and the listing_details side table
+    for table_name in LISTING_SPECS:
+        if 'url' not in table_columns(conn, table_name):
+            conn.execute(f"ALTER TABLE {table_name} ADD COLUMN url TEXT")
+    conn.execute(TABLE_SCHEMAS['listing_details'])
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_listing_details_status ON listing_details(category, status)")
+
+def migrate_locations(conn):
+    # v10: locations dimension and an indexed location_id on every listing,
+    # backfilled from the raw addresses
+    conn.execute(TABLE_SCHEMAS['locations'])
+    for table_name in LISTING_SPECS:
+        if 'location_id' not in table_columns(conn, table_name):
+            conn.execute(f"ALTER TABLE {table_name} ADD COLUMN location_id INTEGER")
+        rows = conn.execute(f"SELECT id, adress FROM {table_name}").fetchall()
+        ids = location_ids(conn, [address for _, address in rows])
+        conn.executemany(
+            f"UPDATE {table_name} SET location_id = ? WHERE id = ?",
+            [(ids.get(address), row_id) for row_id, address in rows]
+        )
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table_name}_location_id ON {table_name}(location_id)")
+
+# Composite indexes behind the facet filters: each facet column leads, followed by the
+# range columns, so a facet count under year and price ranges is a covering index scan
+FACET_INDEXES = {
+    'brand': ('brand', 'year', 'price'),
+    'fuel_gearbox': ('fuel_type', 'gearbox', 'year', 'price'),
+}
+
+def migrate_facet_indexes(conn):
+    # v11: composite indexes for the Dashboard and View Data facet filters,
+    # skipped for tables without every indexed column
+    for table_name in LISTING_SPECS:
+        columns = table_columns(conn, table_name)
+        for name, indexed in FACET_INDEXES.items():
+            if all(column in columns for column in indexed):
+                conn.execute(
+                    f"CREATE INDEX IF NOT EXISTS idx_{table_name}_{name}_facet ON {table_name}({', '.join(indexed)})"
+                )
+
+def migrate_listing_titles(conn):
+    # v12: motos and location keep the model words of the title, and every listing is
+    # re-keyed on its detail url or its whole title, so different listings of one dealer
+    # stop sharing a row. Detail rows follow their new keys; the search index and the
+    # blocking keys are rebuilt to take the model column in.
+    for table_name, spec in LISTING_SPECS.items():
+        if 'model' not in table_columns(conn, table_name):
+            conn.execute(f"ALTER TABLE {table_name} ADD COLUMN model TEXT")
+        old_keys = dict(conn.execute(f"SELECT id, listing_key FROM {table_name}").fetchall())
+        backfill_listing_keys(conn, table_name, spec['key'])
+        conn.executemany(
+            "UPDATE OR IGNORE listing_details SET listing_key = ? WHERE category = ? AND listing_key = ?",
+            [(key, table_name, old_keys[row_id])
+             for row_id, key in conn.execute(f"SELECT id, listing_key FROM {table_name}").fetchall()
+             if old_keys.get(row_id) != key]
+        )
+        has_fts = conn.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (f"{table_name}_fts",)).fetchone()
+        if has_fts and 'model' not in table_columns(conn, f"{table_name}_fts"):
+            for trigger in ('insert', 'delete', 'update'):
+                conn.execute(f"DROP TRIGGER IF EXISTS {table_name}_fts_{trigger}")
+            conn.execute(f"DROP TABLE {table_name}_fts")
+    migrate_search_index(conn)
+    migrate_duplicate_links(conn)
+
+MIGRATIONS = [
+    migrate_listing_keys, migrate_numeric_columns, migrate_dashboard_indexes,
+    migrate_search_index, migrate_browse_indexes, migrate_job_tables,
+    migrate_duplicate_links, migrate_storage_maintenance, migrate_listing_details,
+    migrate_locations, migrate_facet_indexes, migrate_listing_titles,
+]
+SCHEMA_VERSION = len(MIGRATIONS)
+
+def migrate_db(conn):
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    for target, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+        with conn:
+            migration(conn)
+            conn.execute(f"PRAGMA user_version = {target}")
+
+NUMERIC_FIELDS = ('price', 'year', 'kilometer')
+
+def parse_int(value):
+    if value is None or isinstance(value, int):
+        return value
+    if isinstance(value, float):
+        return None if value != value else int(value)
+    digits = re.sub(r'\D', '', value)
+    return int(digits) if digits else None
+
+def normalize_numeric(record):
+    # Parse numeric fields once at ingest; the scraped text is kept alongside for audit
+    for field in NUMERIC_FIELDS:
+        if field in record:
+            record[f'{field}_raw'] = record[field]
+            record[field] = parse_int(record[field])
+    return record
+
+def listing_key(record, key_fields):
+    # Stable identity of a listing: its detail page url when the card has one, otherwise
+    # its normalised card fields (the whole title included), price excluded
+    url = record.get('url')
+    if isinstance(url, str) and url.strip():
+        return hashlib.sha1(url.strip().encode('utf-8')).hexdigest()
+    parts = []
+    for field in key_fields:
+        value = record.get(field)
+        if not isinstance(value, str):
+            if value is None or pd.isna(value):
+                value = ''
+            elif isinstance(value, float):
+                value = int(value)
+            value = str(value)
+        parts.append(" ".join(value.lower().split()))
+    return hashlib.sha1("|".join(parts).encode('utf-8')).hexdigest()
+
+def price_salted_key(key, price):
+    # Key of a listing sharing its card fields with another one at a different price
+    price = None if price is None or pd.isna(price) else parse_int(str(price))
+    return hashlib.sha1(f"{key}|{price}".encode('utf-8')).hexdigest()
+
+def distinct_listings(df):
+    # For a frame holding one scrape: cards sharing a key at different prices are different
+    # listings and keep apart under price-salted keys; only exact repeats are dropped
+    df = df.drop_duplicates(subset=['listing_key', 'price']).reset_index(drop=True)
+    repeated = df['listing_key'].duplicated()
+    df.loc[repeated, 'listing_key'] = [
+        price_salted_key(key, price) for key, price in zip(df.loc[repeated, 'listing_key'], df.loc[repeated, 'price'])
+    ]
+    return df
+
+def parse_int_column(values):
+    # Vectorised parse_int() for a whole column
+    if pd.api.types.is_numeric_dtype(values):
+        return values.astype('Int64')
+    digits = values.astype('string').str.replace(r'\D', '', regex=True)
+    return pd.to_numeric(digits.mask(digits == ''), errors='coerce').astype('Int64')
+
+def normalize_numeric_columns(df):
+    for field in NUMERIC_FIELDS:
+        if field in df.columns:
+            df[f'{field}_raw'] = df[field].astype('string')
+            df[field] = parse_int_column(df[field])
+    return df
+
+def listing_keys(df, key_fields):
+    # Vectorised listing_key() for a whole frame
+    parts = []
+    for field in key_fields:
+        values = df[field] if field in df.columns else pd.Series(pd.NA, index=df.index, dtype='string')
+        if pd.api.types.is_numeric_dtype(values):
+            values = values.astype('Int64')
+        parts.append(values.astype('string').fillna('').str.lower().str.split().str.join(' '))
+    joined = parts[0].str.cat(parts[1:], sep='|')
+    if 'url' in df.columns:
+        urls = df['url'].astype('string').str.strip()
+        joined = urls.where(urls.fillna('') != '', joined)
+    return joined.map(lambda text: hashlib.sha1(text.encode('utf-8')).hexdigest())
+
+# Near-duplicate detection: a repost of the same car gets a new listing_key as soon as
+# one card field changes. Rows are grouped into blocks by their normalised brand, model,
+# year, owner and kilometer bucket; only rows sharing an indexed block_key are compared,
+# and each row links to the first similar listing of its block through canonical_id.
+BLOCK_FIELDS = ('brand', 'model', 'year', 'owner', 'kilometer')
+KM_BUCKET = 10000
+DUPLICATE_THRESHOLD = 0.85
+
+def normalize_words(value):
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return set()
+    return set(re.findall(r'\w+', str(value).lower()))
+
+def block_keys(df):
+    parts = []
+    for field in BLOCK_FIELDS:
+        if field not in df.columns:
+            continue
+        values = df[field]
+        if field == 'kilometer':
+            values = parse_int_column(values) // KM_BUCKET
+        elif pd.api.types.is_numeric_dtype(values):
+            values = values.astype('Int64')
+        parts.append(values.astype('string').fillna('').str.lower().str.replace(r'\W+', ' ', regex=True).str.strip())
+    return parts[0].str.cat(parts[1:], sep='|')
+
+def listing_similarity(a, b):
+    # a and b are (price, kilometer, adress); the mean of the price and kilometer
+    # closeness and of the address word overlap, 1.0 for identical listings.
+    # Kilometers are compared on at least a KM_BUCKET scale, so 1 km vs 300 km is close.
+    scores = []
+    for x, y, scale in zip(a[:2], b[:2], (1, KM_BUCKET)):
+        if x is None or y is None:
+            continue
+        high = max(abs(x), abs(y), scale)
+        scores.append(max(0.0, 1 - abs(x - y) / high))
+    words_a, words_b = normalize_words(a[2]), normalize_words(b[2])
+    if words_a and words_b:
+        scores.append(len(words_a & words_b) / min(len(words_a), len(words_b)))
+    return sum(scores) / len(scores) if scores else 1.0
+
+def link_duplicates(conn, table_name):
+    # Links every row without a canonical_id yet. Rows alone in their block are their
+    # own canonical listing, set in one statement through the block_key index.
+    conn.execute(
+        f"UPDATE {table_name} SET canonical_id = id WHERE canonical_id IS NULL AND (block_key IS NULL OR NOT EXISTS "
+        f"(SELECT 1 FROM {table_name} other WHERE other.block_key = {table_name}.block_key AND other.id != {table_name}.id))"
+    )
+    kilometer = 'kilometer' if 'kilometer' in table_columns(conn, table_name) else 'NULL'
+    pending = conn.execute(
+        f"SELECT id, block_key, price, {kilometer}, adress FROM {table_name} WHERE canonical_id IS NULL ORDER BY id"
+    ).fetchall()
+    if not pending:
+        return 0
+    
+    # Candidates are the canonical rows of the pending blocks, looked up in chunks
+    blocks = sorted({row[1] for row in pending})
+    canonical = {}
+    for start in range(0, len(blocks), WRITE_BATCH_SIZE):
+        chunk = blocks[start:start + WRITE_BATCH_SIZE]
+        for row in conn.execute(
+            f"SELECT id, block_key, price, {kilometer}, adress FROM {table_name} "
+            f"WHERE block_key IN ({', '.join('?' for _ in chunk)}) AND canonical_id = id", chunk
+        ):
+            canonical.setdefault(row[1], []).append(row)
+    
+    links = []
+    for row in pending:
+        candidates = canonical.setdefault(row[1], [])
+        best = max(candidates, key=lambda other: listing_similarity(row[2:], other[2:]), default=None)
+        if best is not None and listing_similarity(row[2:], best[2:]) >= DUPLICATE_THRESHOLD:
+            links.append((best[0], row[0]))
+        else:
+            links.append((row[0], row[0]))
+            candidates.append(row)
+    conn.executemany(f"UPDATE {table_name} SET canonical_id = ? WHERE id = ?", links)
+    return sum(1 for canonical_id, row_id in links if canonical_id != row_id)
+
+# Locations: raw addresses such as "Golf,\n\t\t\t\tDakar" are normalised once per distinct
+# string into a (neighborhood, city) row of the locations table; listings keep the
+# integer location_id next to the raw adress, which search and duplicate scoring read
+@functools.lru_cache(maxsize=65536)
+def normalize_location(address):
+    # "Golf,\n  Dakar" -> ('Golf', 'Dakar'); a single part is a city without neighborhood
+    parts = [" ".join(part.split()).title() for part in address.split(',')]
+    parts = [part for part in parts if part]
+    if not parts:
+        return None
+    return (parts[0] if len(parts) > 1 else '', parts[-1])
+
+def location_ids(conn, addresses):
+    # Returns {raw address: location id}, adding the locations not seen before
+    normalized = {}
+    for address in set(addresses):
+        if isinstance(address, str):
+            location = normalize_location(address)
+            if location is not None:
+                normalized[address] = location
+    conn.executemany("INSERT OR IGNORE INTO locations (neighborhood, city) VALUES (?, ?)", set(normalized.values()))
+    known = {(row[1], row[2]): row[0] for row in conn.execute("SELECT id, neighborhood, city FROM locations")}
+    return {address: known[location] for address, location in normalized.items()}
 
 def save_to_db(df, table_name):
-    df['scraped_date'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    conn = sqlite3.connect('daka_auto.db')
-    df.to_sql(table_name, conn, if_exists='append', index=False)
-    conn.close()
+    if 'price_raw' not in df.columns:
+        df = normalize_numeric_columns(df.copy())
+    if 'listing_key' not in df.columns:
+        df['listing_key'] = listing_keys(df, LISTING_SPECS[table_name]['key'])
+    if 'block_key' not in df.columns:
+        df['block_key'] = block_keys(df)
+    if 'location_id' not in df.columns:
+        with db_connection() as conn:
+            with conn:
+                ids = location_ids(conn, df['adress'])
+        df['location_id'] = df['adress'].map(ids).astype('Int64')
+    
+    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    df['scraped_date'] = now
+    df['first_seen'] = now
+    df['last_seen'] = now
+    columns = list(df.columns)
+    placeholders = ", ".join("?" for _ in columns)
+    sql = (f"INSERT INTO {table_name} ({', '.join(columns)}) VALUES ({placeholders}) "
+           "ON CONFLICT(listing_key) DO UPDATE SET price = excluded.price, price_raw = excluded.price_raw, "
+           f"{'url = COALESCE(excluded.url, url), ' if 'url' in columns else ''}"
+           "scraped_date = excluded.scraped_date, last_seen = excluded.last_seen")
+    with timed('dakar_auto_stage_seconds', stage='save', table=table_name):
+        rows = df.astype(object).where(df.notna(), None).itertuples(index=False, name=None)
+        # One transaction for the whole frame, fed to executemany in chunks
+        with db_connection() as conn:
+            with conn:
+                while True:
+                    chunk = list(itertools.islice(rows, WRITE_BATCH_SIZE))
+                    if not chunk:
+                        break
+                    conn.executemany(sql, chunk)
+                link_duplicates(conn, table_name)
+                if 'url' in columns:
+                    # Only listings never seen before get queued, known ones are ignored by the key
+                    conn.executemany(
+                        "INSERT OR IGNORE INTO listing_details (category, listing_key, url, status) VALUES (?, ?, ?, 'pending')",
+                        ((table_name, key, url) for key, url in zip(df['listing_key'], df['url']) if isinstance(url, str))
+                    )
+    bump_write_version(table_name)
+    increment('dakar_auto_rows_total', len(df), stage='save', table=table_name)
+
+def load_listing_keys(table_name):
+    with db_connection() as conn:
+        try:
+            keys = {row[0] for row in conn.execute(f"SELECT listing_key FROM {table_name}")}
+        except sqlite3.Error:
+            keys = set()
+    return keys
 
+@shared_result
 def load_from_db(table_name):
-    conn = sqlite3.connect('daka_auto.db')
-    try:
+    with timed('dakar_auto_stage_seconds', stage='load', table=table_name), db_connection() as conn:
         df = pd.read_sql_query(f"SELECT * FROM {table_name}", conn)
-    except:
-        df = pd.DataFrame()
-    conn.close()
+    increment('dakar_auto_rows_total', len(df), stage='load', table=table_name)
     return df
 
-# Scraping functions
-def scrape_voitures(num_pages):
-    df = pd.DataFrame()
-    progress_bar = st.progress(0)
-    status_text = st.empty()
+def clear_table(table_name):
+    with db_connection() as conn:
+        with conn:
+            conn.execute(f"DELETE FROM {table_name}")
+    bump_write_version(table_name)
+
+# Dashboard aggregations, computed in SQLite so only the small results reach pandas
+def query_db(sql, params=(), name='query'):
+    # Failures are raised, not turned into an empty frame: shared_result would cache that
+    # for every session until the next write, showing a "database is locked" timeout
+    # during a migration or maintenance as "No data available"
+    with timed('dakar_auto_query_seconds', query=name), db_connection() as conn:
+        try:
+            return pd.read_sql_query(sql, conn, params=params)
+        except Exception:
+            increment('dakar_auto_query_errors_total', query=name)
+            raise
+
+FILTER_COLUMNS = ('location_id', 'brand', 'fuel_type', 'gearbox')
+RANGE_FILTER_COLUMNS = ('year', 'price')
+
+def filter_clause(filters, exclude=None):
+    # filters is a tuple of (column, values) pairs, hashable for the shared result cache.
+    # FILTER_COLUMNS become a parameterised "column IN (...)", RANGE_FILTER_COLUMNS take
+    # (low, high) with None for an open end; the pairs are ANDed together. exclude drops
+    # one column's own filter, which facet counts need.
+    clauses, params = [], []
+    for column, values in filters:
+        if column == exclude:
+            continue
+        if column in FILTER_COLUMNS:
+            clauses.append(f"{column} IN ({', '.join('?' for _ in values)})")
+            params.extend(values)
+        elif column in RANGE_FILTER_COLUMNS:
+            low, high = values
+            if low is not None:
+                clauses.append(f"{column} >= ?")
+                params.append(low)
+            if high is not None:
+                clauses.append(f"{column} <= ?")
+                params.append(high)
+        else:
+            raise ValueError(f"Cannot filter on {column}")
+    return " AND ".join(clauses) or "1", tuple(params)
+
+@shared_result
+def dashboard_metrics(table_name, filters=()):
+    # One scalar subquery per metric so each can be answered from its own index
+    where, params = filter_clause(filters)
+    df = query_db(
+        f"SELECT (SELECT COUNT(*) FROM {table_name} WHERE {where}) AS total, "
+        f"(SELECT COUNT(DISTINCT brand) FROM {table_name} WHERE {where}) AS brands, "
+        f"(SELECT COUNT(DISTINCT canonical_id) FROM {table_name} WHERE {where}) AS unique_listings, "
+        f"(SELECT AVG(price) FROM {table_name} WHERE {where}) AS avg_price, "
+        f"(SELECT MAX(year) FROM {table_name} WHERE {where}) AS latest_year",
+        params * 5, name='dashboard_metrics'
+    )
+    if len(df) == 0:
+        return {'total': 0, 'brands': 0, 'unique_listings': 0, 'avg_price': None, 'latest_year': None}
+    return df.iloc[0].to_dict()
+
+@shared_result
+def top_brands(table_name, limit=10, filters=()):
+    where, params = filter_clause(filters)
+    return query_db(
+        f"SELECT brand, COUNT(*) AS count FROM {table_name} WHERE {where} "
+        f"GROUP BY brand ORDER BY count DESC LIMIT ?",
+        params + (limit,), name='top_brands'
+    )
+
+@shared_result
+def year_counts(table_name, filters=()):
+    where, params = filter_clause(filters)
+    return query_db(
+        f"SELECT year, COUNT(*) AS count FROM {table_name} "
+        f"WHERE year IS NOT NULL AND {where} GROUP BY year ORDER BY year",
+        params, name='year_counts'
+    )
+
+@shared_result
+def area_counts(table_name, limit=15, filters=()):
+    # Grouped on the integer location_id, names are joined in for the few result rows
+    where, params = filter_clause(filters)
+    return query_db(
+        f"SELECT l.id AS location_id, l.neighborhood, l.city, a.count, a.avg_price FROM "
+        f"(SELECT location_id, COUNT(*) AS count, AVG(price) AS avg_price FROM {table_name} "
+        f"WHERE location_id IS NOT NULL AND {where} GROUP BY location_id ORDER BY count DESC LIMIT ?) a "
+        f"JOIN locations l ON l.id = a.location_id ORDER BY a.count DESC",
+        params + (limit,), name='area_counts'
+    )
+
+# Facet counts: each value of a column with the number of listings it would match under
+# every other active filter, so selecting it never leads to an empty result. The
+# composite facet indexes let SQLite count from the index without reading table rows.
+@shared_result
+def facet_counts(table_name, column, filters=()):
+    if column not in FILTER_COLUMNS:
+        raise ValueError(f"Cannot facet on {column}")
+    where, params = filter_clause(filters, exclude=column)
+    return query_db(
+        f"SELECT {column} AS value, COUNT(*) AS count FROM {table_name} "
+        f"WHERE {column} IS NOT NULL AND {where} GROUP BY {column} ORDER BY {column}",
+        params, name='facet_counts'
+    )
+
+@shared_result
+def column_bounds(table_name, column):
+    # MIN and MAX are each a single seek on the column index
+    df = query_db(f"SELECT MIN({column}) AS low, MAX({column}) AS high FROM {table_name}", name='column_bounds')
+    if len(df) == 0 or pd.isna(df['low'][0]):
+        return None, None
+    return int(df['low'][0]), int(df['high'][0])
+
+@shared_result
+def table_locations(table_name):
+    # Every location used by the table, for the area filter widgets
+    return query_db(
+        f"SELECT l.id, l.neighborhood, l.city FROM locations l "
+        f"WHERE l.id IN (SELECT DISTINCT location_id FROM {table_name}) ORDER BY l.city, l.neighborhood",
+        name='table_locations'
+    )
+
+MAX_PRICE_BINS = 100
+PRICE_CLIP_OPTIONS = {"None": 0.0, "0.5% each tail": 0.005, "1% each tail": 0.01, "5% each tail": 0.05}
+
+def price_quantiles(table_name, fractions, filters=()):
+    # Returns (count, values). Each quantile walks the price index from the nearer
+    # end with LIMIT 1 OFFSET k, so no row is sorted or sent to pandas.
+    where, params = filter_clause(filters)
+    df = query_db(f"SELECT COUNT(price) AS n FROM {table_name} WHERE {where}", params, name='price_count')
+    n = int(df['n'][0]) if len(df) > 0 else 0
+    if n == 0:
+        return 0, []
+    values = []
+    for fraction in fractions:
+        rank = min(n - 1, max(0, round(fraction * (n - 1))))
+        direction, offset = ('ASC', rank) if rank < n / 2 else ('DESC', n - 1 - rank)
+        row = query_db(
+            f"SELECT price FROM {table_name} WHERE price IS NOT NULL AND {where} "
+            f"ORDER BY price {direction} LIMIT 1 OFFSET ?",
+            params + (offset,), name='price_quantile'
+        )
+        values.append(float(row['price'][0]))
+    return n, values
+
+def adaptive_bin_count(n, q1, q3, low, high):
+    # Freedman-Diaconis bin width 2 * IQR / n^(1/3), Sturges' rule when the IQR is empty
+    if high <= low:
+        return 1
+    if q3 > q1:
+        bins = math.ceil((high - low) / (2 * (q3 - q1) / n ** (1 / 3)))
+    else:
+        bins = math.ceil(math.log2(n)) + 1
+    return max(1, min(MAX_PRICE_BINS, bins))
+
+@shared_result
+def price_histogram(table_name, bins=None, clip=0.0, filters=()):
+    # Bins the prices between the clip and 1 - clip quantiles in SQLite and returns
+    # (bins, clipped listings); the result size depends on the bin count, not on rows
+    n, quantiles = price_quantiles(table_name, (clip, 0.25, 0.75, 1 - clip), filters)
+    if n == 0:
+        return pd.DataFrame(columns=['bin', 'count', 'start', 'end']), 0
+    low, q1, q3, high = quantiles
+    bins = bins or adaptive_bin_count(n, q1, q3, low, high)
+    width = (high - low) / bins or 1.0
+    where, params = filter_clause(filters)
+    hist = query_db(
+        f"SELECT MIN(CAST((price - ?) / ? AS INTEGER), ?) AS bin, COUNT(*) AS count "
+        f"FROM {table_name} WHERE price BETWEEN ? AND ? AND {where} GROUP BY bin ORDER BY bin",
+        (low, width, bins - 1, low, high) + params, name='price_histogram'
+    )
+    hist['start'] = low + hist['bin'] * width
+    hist['end'] = hist['start'] + width
+    return hist, n - int(hist['count'].sum())
+
+# Keyset pagination for View Data
+SORTABLE_COLUMNS = ('id', 'last_seen', 'price', 'year', 'kilometer', 'brand')
+PAGE_SIZES = (25, 50, 100, 250, 500)
+
+@shared_result
+def count_rows(table_name, filters=()):
+    where, params = filter_clause(filters)
+    df = query_db(f"SELECT COUNT(*) AS total FROM {table_name} WHERE {where}", params, name='count_rows')
+    return int(df['total'][0]) if len(df) > 0 else 0
+
+def keyset_segments(column, descending, cursor):
+    # WHERE clauses, in page order, that together continue after cursor = (value, id).
+    # SQLite sorts NULLs first ascending and last descending; keeping the NULL and
+    # non-NULL rows in separate segments lets each one stay an index range scan.
+    op = '<' if descending else '>'
+    if column == 'id':
+        return [(f"id {op} ?", (cursor[1],))] if cursor else [("1", ())]
+    nulls = (f"{column} IS NULL", ())
+    values = (f"{column} IS NOT NULL", ())
+    if cursor is None:
+        return [values, nulls] if descending else [nulls, values]
+    value, row_id = cursor
+    if value is None:
+        after_nulls = (f"{column} IS NULL AND id {op} ?", (row_id,))
+        return [after_nulls] if descending else [after_nulls, values]
+    after_values = (f"({column}, id) {op} (?, ?)", (value, row_id))
+    return [after_values, nulls] if descending else [after_values]
+
+@shared_result
+def browse_table(table_name, sort_column='id', descending=False, page_size=50, cursor=None, filters=()):
+    direction = 'DESC' if descending else 'ASC'
+    filter_where, filter_params = filter_clause(filters)
+    pages = []
+    remaining = page_size
+    for where, params in keyset_segments(sort_column, descending, cursor):
+        df = query_db(
+            f"SELECT * FROM {table_name} WHERE {where} AND {filter_where} "
+            f"ORDER BY {sort_column} {direction}, id {direction} LIMIT ?",
+            params + filter_params + (remaining,), name='browse'
+        )
+        pages.append(df)
+        remaining -= len(df)
+        if remaining <= 0:
+            break
+    return pd.concat(pages, ignore_index=True) if pages else pd.DataFrame()
+
+# Full-text search
+SEARCH_LIMIT = 500
+
+def fts_query(text):
+    # Every word must match, each as a prefix: "toy cor" finds "Toyota Corolla"
+    terms = re.findall(r'\w+', text)
+    return " ".join(f'"{term}"*' for term in terms)
+
+def search_source(conn, table_name, text, filters=()):
+    # (FROM ... WHERE clause, params, rank column) selecting the rows of table_name, as
+    # t, that match text under filters; None when text has no word to search for
+    filter_where, filter_params = filter_clause(filters)
+    has_fts = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE name = ?", (f"{table_name}_fts",)
+    ).fetchone() is not None
+    if has_fts:
+        match = fts_query(text)
+        if not match:
+            return None
+        return (f"(SELECT rowid, rank FROM {table_name}_fts WHERE {table_name}_fts MATCH ?) m "
+                f"JOIN {table_name} t ON t.id = m.rowid WHERE {filter_where}",
+                (match,) + filter_params, 'm.rank')
+    columns = [column for column in FTS_COLUMNS if column in table_columns(conn, table_name)]
+    where = " OR ".join(f"{column} LIKE ?" for column in columns)
+    return (f"{table_name} t WHERE ({where}) AND {filter_where}",
+            tuple(f"%{text}%" for _ in columns) + filter_params, None)
+
+@shared_result
+def search_listings(table_name, text, limit=SEARCH_LIMIT, filters=()):
+    with db_connection() as conn:
+        source = search_source(conn, table_name, text, filters)
+    if source is None:
+        return pd.DataFrame()
+    from_where, params, rank = source
+    return query_db(
+        f"SELECT t.* FROM {from_where} ORDER BY {rank or 't.id'} LIMIT ?",
+        params + (limit,), name='search' if rank else 'search_like'
+    )
+
+# HTTP fetching
+MAX_IN_FLIGHT = 8
+MAX_IN_FLIGHT_LIMIT = 16
+
+@st.cache_resource
+def get_http_session():
+    # One keep-alive session shared by every scraper, rerun and user session
+    import requests
+    from requests.adapters import HTTPAdapter
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=MAX_IN_FLIGHT_LIMIT)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+# HTTP page cache: page bodies are stored once per content hash under CACHE_DIR/objects,
+# and every fetch of a url is recorded in CACHE_DIR/index.db with its validators.
+CACHE_DIR = os.environ.get('DAKAR_AUTO_CACHE', '.http_cache')
+CACHE_TTL = 3600
+CACHE_MAX_BYTES = 512 * 1024 * 1024
+CACHE_USE, CACHE_BYPASS, CACHE_REPLAY = 'use', 'bypass', 'replay'
+FETCH_RETRIES = 3
+FETCH_BACKOFF = 1.0
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+def cache_connect():
+    os.makedirs(os.path.join(CACHE_DIR, 'objects'), exist_ok=True)
+    conn = sqlite3.connect(os.path.join(CACHE_DIR, 'index.db'), timeout=30)
+    conn.execute('''CREATE TABLE IF NOT EXISTS fetches
+                    (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                     url TEXT, fetched_at REAL, digest TEXT, size INTEGER,
+                     etag TEXT, last_modified TEXT)''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_fetches_url ON fetches(url, fetched_at)")
+    return conn
+
+def cache_object_path(digest):
+    return os.path.join(CACHE_DIR, 'objects', digest[:2], digest)
+
+def cache_lookup(url):
+    conn = cache_connect()
+    row = conn.execute(
+        "SELECT fetched_at, digest, etag, last_modified FROM fetches WHERE url = ? ORDER BY fetched_at DESC LIMIT 1",
+        (url,)
+    ).fetchone()
+    conn.close()
+    if row is None or not os.path.exists(cache_object_path(row[1])):
+        return None
+    with open(cache_object_path(row[1]), 'rb') as f:
+        content = f.read()
+    return {'fetched_at': row[0], 'digest': row[1], 'etag': row[2], 'last_modified': row[3], 'content': content}
+
+def cache_store(url, content, etag=None, last_modified=None):
+    digest = hashlib.sha256(content).hexdigest()
+    path = cache_object_path(digest)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+    conn = cache_connect()
+    with conn:
+        conn.execute(
+            "INSERT INTO fetches (url, fetched_at, digest, size, etag, last_modified) VALUES (?, ?, ?, ?, ?, ?)",
+            (url, time.time(), digest, len(content), etag, last_modified)
+        )
+    conn.close()
+
+def evict_cache(max_bytes=CACHE_MAX_BYTES):
+    # Drop the least recently fetched page bodies until the cache fits in max_bytes
+    conn = cache_connect()
+    rows = conn.execute(
+        "SELECT digest, MAX(fetched_at), MAX(size) FROM fetches GROUP BY digest ORDER BY MAX(fetched_at)"
+    ).fetchall()
+    total = sum(size for _, _, size in rows)
+    with conn:
+        for digest, _, size in rows:
+            if total <= max_bytes:
+                break
+            conn.execute("DELETE FROM fetches WHERE digest = ?", (digest,))
+            if os.path.exists(cache_object_path(digest)):
+                os.remove(cache_object_path(digest))
+            total -= size
+    conn.close()
+
+@st.cache_resource
+def get_host_schedule():
+    return {'lock': threading.Lock(), 'next': {}}
+
+def wait_for_host(url, interval):
+    # Hands out request slots at least interval seconds apart per host, shared by
+    # every worker thread, and sleeps until this request's slot comes up
+    host = urlsplit(url).netloc
+    schedule = get_host_schedule()
+    with schedule['lock']:
+        now = time.monotonic()
+        slot = max(now, schedule['next'].get(host, now))
+        schedule['next'][host] = slot + interval
+    if slot > now:
+        time.sleep(slot - now)
+
+def fetch_page(session, url, cache_mode=CACHE_USE, host_interval=0.0):
+    # Transient failures are retried with exponential backoff and jitter;
+    # the last error is raised once FETCH_RETRIES retries are used up.
+    # Any other error status (403, 404, ...) is raised straight away.
+    import requests
+    for attempt in range(FETCH_RETRIES + 1):
+        start = time.perf_counter()
+        try:
+            source, content = fetch_page_source(session, url, cache_mode, host_interval)
+        except requests.RequestException as error:
+            increment('dakar_auto_fetch_errors_total', attempt=attempt)
+            response = getattr(error, 'response', None)
+            if attempt == FETCH_RETRIES or (response is not None and response.status_code not in RETRY_STATUSES):
+                raise
+            time.sleep(FETCH_BACKOFF * 2 ** attempt * random.uniform(0.5, 1.5))
+            continue
+        observe('dakar_auto_fetch_seconds', time.perf_counter() - start, source=source)
+        increment('dakar_auto_fetch_bytes_total', len(content), source=source)
+        return content
+
+def fetch_page_source(session, url, cache_mode=CACHE_USE, host_interval=0.0):
+    # Returns (source, content); source says whether the page came from the
+    # network, a fresh cache entry, a 304 revalidation or an offline replay.
+    # Only requests that reach the network wait for their host_interval slot.
+    import requests
+    if cache_mode == CACHE_BYPASS:
+        if host_interval:
+            wait_for_host(url, host_interval)
+        res = session.get(url, timeout=30)
+        if res.status_code != 200:
+            raise requests.HTTPError(f"HTTP {res.status_code} for {url}", response=res)
+        return 'network', res.content
     
-    for index in range(1, num_pages + 1):
-        status_text.text(f'Scraping page {index}/{num_pages}...')
-        progress_bar.progress(index / num_pages)
-        
-        url = f'https://dakar-auto.com/senegal/voitures-4?&page={index}'
-        res = get(url)
-        soup = bs(res.content, 'html.parser')
-        containers = soup.find_all('div', class_='listings-cards__list-item mb-md-3 mb-3')
-        
-        data = []
-        for container in containers:
-            try:
-                gen_inf = container.find('h2', class_='listing-card__header__title mb-md-2 mb-0').a.text.strip().split()
-                brand = gen_inf[0]
-                model = " ".join(gen_inf[1:len(gen_inf)-1])
-                year = gen_inf[-1]
-                
-                gen_inf1 = container.find('ul', class_='listing-card__attribute-list list-inline mb-0')
-                gen_inf2 = gen_inf1.find_all('li', class_='listing-card__attribute list-inline-item')
-                kms_driven = gen_inf2[1].text.replace('km','').strip()
-                gearbox = gen_inf2[2].text.strip()
-                fuel_type = gen_inf2[3].text.strip()
-                
-                adress = container.find('div', class_='col-12 entry-zone-address').text.strip()
-                owner = container.find('p', class_='time-author m-0').a.text.replace('Par','').strip()
-                price = container.find('h3','listing-card__header__price font-weight-bold text-uppercase mb-0').text.strip()
-                price = "".join(price.split()).replace('FCFA','')
-                
-                dic = {
-                    "brand": brand, "model": model, "year": year,
-                    "kilometer": kms_driven, "fuel_type": fuel_type,
-                    "gearbox": gearbox, "adress": adress,
-                    "owner": owner, "price": price
-                }
-                data.append(dic)
-            except:
-                continue
-        
-        DF = pd.DataFrame(data)
-        df = pd.concat([df, DF], ignore_index=True)
+    cached = cache_lookup(url)
+    if cache_mode == CACHE_REPLAY:
+        # Offline: never touch the network, a page that was never cached is empty
+        return 'replay', cached['content'] if cached else b''
+    if cached and time.time() - cached['fetched_at'] < CACHE_TTL:
+        return 'cache', cached['content']
     
-    df = df.drop_duplicates().reset_index(drop=True)
-    progress_bar.empty()
-    status_text.empty()
+    headers = {}
+    if cached and cached['etag']:
+        headers['If-None-Match'] = cached['etag']
+    if cached and cached['last_modified']:
+        headers['If-Modified-Since'] = cached['last_modified']
+    if host_interval:
+        wait_for_host(url, host_interval)
+    res = session.get(url, headers=headers, timeout=30)
+    if res.status_code == 304 and cached:
+        cache_store(url, cached['content'], cached['etag'], cached['last_modified'])
+        return 'revalidated', cached['content']
+    if res.status_code != 200:
+        raise requests.HTTPError(f"HTTP {res.status_code} for {url}", response=res)
+    cache_store(url, res.content, res.headers.get('ETag'), res.headers.get('Last-Modified'))
+    return 'network', res.content
+
+def fetch_pages(urls, max_in_flight=MAX_IN_FLIGHT, cache_mode=CACHE_USE, host_interval=0.0):
+    # Fetch urls on a bounded thread pool, yielding (content, error) in url order.
+    # At most max_in_flight requests are open at once; the next url is only
+    # submitted once the oldest pending page has been handed to the caller.
+    # A page that still fails after its retries is yielded with its error
+    # instead of ending the whole crawl.
+    session = get_http_session()
+    max_in_flight = max(1, min(int(max_in_flight), MAX_IN_FLIGHT_LIMIT))
+    urls = iter(urls)
+    with ThreadPoolExecutor(max_workers=max_in_flight) as pool:
+        pending = deque()
+        for url in urls:
+            pending.append(pool.submit(fetch_page, session, url, cache_mode, host_interval))
+            if len(pending) >= max_in_flight:
+                break
+        try:
+            while pending:
+                try:
+                    page = (pending.popleft().result(), None)
+                except Exception as e:
+                    page = (None, e)
+                next_url = next(urls, None)
+                if next_url is not None:
+                    pending.append(pool.submit(fetch_page, session, next_url, cache_mode, host_interval))
+                yield page
+        finally:
+            for future in pending:
+                future.cancel()
+
+# Listing extraction
+def css_to_xpath(css):
+    # Compile a simple descendant selector such as 'ul.list li.item' into XPath;
+    # a trailing '@attr' part selects that attribute of the matched elements
+    steps = []
+    for part in css.split():
+        if part.startswith('@'):
+            steps.append(part)
+            continue
+        tag, _, cls = part.partition('.')
+        step = f"descendant::{tag or '*'}"
+        if cls:
+            step += f"[contains(concat(' ', normalize-space(@class), ' '), ' {cls} ')]"
+        steps.append(step)
+    return '/'.join(steps)
+
+# The card match is exact on the class attribute, like find_all(class_=...) was
+LISTING_CARD_SEL = "//div[@class='listings-cards__list-item mb-md-3 mb-3']"
+
+# Card selectors as CSS; listing_selectors() compiles them once per process
+TITLE_SEL = 'h2.listing-card__header__title a'
+ATTRIBUTES_SEL = 'ul.listing-card__attribute-list li.listing-card__attribute'
+ADDRESS_SEL = 'div.entry-zone-address'
+OWNER_SEL = 'p.time-author a'
+PRICE_SEL = 'h3.listing-card__header__price'
+URL_SEL = 'h2.listing-card__header__title a @href'
+SITE_URL = 'https://dakar-auto.com'
+
+REQUIRED = object()
+
+def _title_words(texts):
+    return texts[0].strip().split()
+
+def _first(texts):
+    return texts[0].strip()
+
+def _owner(texts):
+    return texts[0].replace('Par', '').strip()
+
+def _price(texts):
+    return "".join(texts[0].split()).replace('FCFA', '')
+
+def _url(texts):
+    return urljoin(SITE_URL, texts[0].strip())
+
+def _moto_kms(texts):
+    kms_text = texts[1].strip()
+    if 'km' not in kms_text:
+        raise ValueError(kms_text)
+    return kms_text.replace('km', '').strip()
+
+# Each category lists its page url, the fields that identify a listing ('key') and its
+# field specs: (column, selector, post-processing, default).
+# Post-processing receives the text of every element the selector matched in the card.
+# A field whose default is REQUIRED drops the whole card when it cannot be extracted.
+LISTING_SPECS = {
+    'voitures': {
+        'url': 'https://dakar-auto.com/senegal/voitures-4?&page={page}',
+        'key': ['brand', 'model', 'year', 'kilometer', 'fuel_type', 'gearbox', 'adress', 'owner'],
+        'fields': [
+            ('brand', TITLE_SEL, lambda texts: _title_words(texts)[0], REQUIRED),
+            ('model', TITLE_SEL, lambda texts: " ".join(_title_words(texts)[1:-1]), REQUIRED),
+            ('year', TITLE_SEL, lambda texts: _title_words(texts)[-1], REQUIRED),
+            ('kilometer', ATTRIBUTES_SEL, lambda texts: texts[1].replace('km', '').strip(), REQUIRED),
+            ('fuel_type', ATTRIBUTES_SEL, lambda texts: texts[3].strip(), REQUIRED),
+            ('gearbox', ATTRIBUTES_SEL, lambda texts: texts[2].strip(), REQUIRED),
+            ('adress', ADDRESS_SEL, _first, REQUIRED),
+            ('owner', OWNER_SEL, _owner, REQUIRED),
+            ('price', PRICE_SEL, _price, REQUIRED),
+            ('url', URL_SEL, _url, None),
+        ],
+    },
+    'motos': {
+        'url': 'https://dakar-auto.com/senegal/motos-and-scooters-3?&page={page}',
+        'key': ['brand', 'model', 'year', 'kilometer', 'adress', 'owner'],
+        'fields': [
+            ('brand', TITLE_SEL, lambda texts: _title_words(texts)[0], REQUIRED),
+            ('model', TITLE_SEL, lambda texts: " ".join(_title_words(texts)[1:-1]), REQUIRED),
+            ('year', TITLE_SEL, lambda texts: _title_words(texts)[-1], REQUIRED),
+            ('kilometer', ATTRIBUTES_SEL, _moto_kms, "0"),
+            ('adress', ADDRESS_SEL, _first, REQUIRED),
+            ('owner', OWNER_SEL, _owner, REQUIRED),
+            ('price', PRICE_SEL, _price, REQUIRED),
+            ('url', URL_SEL, _url, None),
+        ],
+    },
+    'location': {
+        'url': 'https://dakar-auto.com/senegal/location-de-voitures-19?&page={page}',
+        'key': ['brand', 'model', 'year', 'adress', 'owner'],
+        'fields': [
+            ('brand', TITLE_SEL, lambda texts: _title_words(texts)[0], REQUIRED),
+            ('model', TITLE_SEL, lambda texts: " ".join(_title_words(texts)[1:-1]), REQUIRED),
+            ('year', TITLE_SEL, lambda texts: _title_words(texts)[-1], REQUIRED),
+            ('adress', ADDRESS_SEL, _first, REQUIRED),
+            ('owner', OWNER_SEL, _owner, REQUIRED),
+            ('price', PRICE_SEL, _price, REQUIRED),
+            ('url', URL_SEL, _url, None),
+        ],
+    },
+}
+
+@st.cache_resource
+def listing_selectors():
+    from lxml import etree
+    selectors = {LISTING_CARD_SEL: etree.XPath(LISTING_CARD_SEL)}
+    for spec in LISTING_SPECS.values():
+        for _, selector, _, _ in spec['fields']:
+            if selector not in selectors:
+                selectors[selector] = etree.XPath(css_to_xpath(selector))
+    return selectors
+
+def extract_card(card, fields, selectors):
+    record = {}
+    matches = {}
+    for name, selector, post, default in fields:
+        if selector not in matches:
+            matches[selector] = [
+                element if isinstance(element, str) else element.text_content() for element in selectors[selector](card)
+            ]
+        try:
+            record[name] = post(matches[selector])
+        except:
+            if default is REQUIRED:
+                return None
+            record[name] = default
+    return record
+
+def parse_html(content):
+    # Pages are decoded as UTF-8 up front: given bytes without a meta charset, libxml2
+    # falls back to Latin-1 and mangles accented addresses and the narrow spaces of prices
+    from lxml import html
+    if isinstance(content, bytes):
+        try:
+            return html.fromstring(content.decode('utf-8'))
+        except (UnicodeDecodeError, ValueError):
+            pass
+    return html.fromstring(content)
+
+def parse_listing_page(content, fields):
+    from lxml import etree
+    selectors = listing_selectors()
+    records = []
+    try:
+        root = parse_html(content)
+    except (etree.ParserError, ValueError):
+        return records
+    for card in selectors[LISTING_CARD_SEL](root):
+        record = extract_card(card, fields, selectors)
+        if record is not None:
+            records.append(record)
+    return records
+
+# Scraping functions
+def listing_frame(category, records):
+    fields = [name for name, _, _, _ in LISTING_SPECS[category]['fields']]
+    columns = fields + [f'{field}_raw' for field in NUMERIC_FIELDS if field in fields] + ['listing_key']
+    with timed('dakar_auto_stage_seconds', stage='dataframe', table=category):
+        df = pd.DataFrame(records, columns=columns)
+        for field in NUMERIC_FIELDS:
+            if field in fields:
+                df[field] = df[field].astype('Int64')
+        df = df.drop_duplicates(subset='listing_key').reset_index(drop=True)
     return df
 
-def scrape_motos(num_pages):
-    df = pd.DataFrame()
+def iter_listings(category, num_pages, max_in_flight=MAX_IN_FLIGHT, known_keys=None, cache_mode=CACHE_USE,
+                  skip_pages=(), on_error=None):
+    # Streaming crawl: yields (index, page_records) as soon as each page is parsed, in
+    # page order, so callers can save and show rows without waiting for the last page.
+    # Listings already yielded earlier in the stream are dropped, so every record is
+    # new. With known_keys (incremental mode) pagination stops after the first page
+    # whose listings are all already stored, and that page is fetched on its own before
+    # the pool opens, so an hour without new listings costs one request. CACHE_REPLAY
+    # re-runs the extraction over cached pages without any network access. Pages in
+    # skip_pages (already checkpointed) are not fetched again. A page served with an error
+    # status, or still failing after its retries, is passed to on_error(index, error)
+    # and the crawl moves on; without on_error the error is raised.
+    spec = LISTING_SPECS[category]
+    seen = set()
+    page_numbers = [index for index in range(1, num_pages + 1) if index not in skip_pages]
+    urls = [spec['url'].format(page=index) for index in page_numbers]
+    batches = [(page_numbers, urls)]
+    if known_keys is not None:
+        batches = [(page_numbers[:1], urls[:1]), (page_numbers[1:], urls[1:])]
+    # The next batch's pool is only opened once the previous batch is exhausted
+    pages = itertools.chain.from_iterable(
+        zip(numbers, fetch_pages(batch_urls, max_in_flight, cache_mode)) for numbers, batch_urls in batches
+    )
+    try:
+        for index, (content, error) in pages:
+            if error is not None:
+                if on_error is None:
+                    raise error
+                on_error(index, error)
+                continue
+            with timed('dakar_auto_stage_seconds', stage='parse', table=category):
+                page_records = parse_listing_page(content, spec['fields'])
+                for record in page_records:
+                    normalize_numeric(record)
+                    record['listing_key'] = listing_key(record, spec['key'])
+            increment('dakar_auto_rows_total', len(page_records), stage='parse', table=category)
+            new_records = []
+            for record in page_records:
+                if record['listing_key'] not in seen:
+                    seen.add(record['listing_key'])
+                    new_records.append(record)
+            yield index, new_records
+            if known_keys is not None and page_records and all(record['listing_key'] in known_keys for record in page_records):
+                break
+    finally:
+        if cache_mode == CACHE_USE:
+            evict_cache()
+
+def crawl_listings(category, num_pages, max_in_flight=MAX_IN_FLIGHT, known_keys=None, cache_mode=CACHE_USE,
+                   on_page=None, skip_pages=(), on_error=None):
+    # Collects the whole stream into one DataFrame; on_page(index, page_records) is
+    # called after every page, in page order.
+    records = []
+    for index, page_records in iter_listings(category, num_pages, max_in_flight, known_keys, cache_mode, skip_pages, on_error):
+        records.extend(page_records)
+        if on_page is not None:
+            on_page(index, page_records)
+    return listing_frame(category, records)
+
+def scrape_listings(category, num_pages, max_in_flight=MAX_IN_FLIGHT, known_keys=None, cache_mode=CACHE_USE):
     progress_bar = st.progress(0)
     status_text = st.empty()
     
-    for index in range(1, num_pages + 1):
+    def on_page(index, page_records):
         status_text.text(f'Scraping page {index}/{num_pages}...')
         progress_bar.progress(index / num_pages)
-        
-        url = f'https://dakar-auto.com/senegal/motos-and-scooters-3?&page={index}'
-        res = get(url)
-        soup = bs(res.content, 'html.parser')
-        containers = soup.find_all('div', class_='listings-cards__list-item mb-md-3 mb-3')
-        
-        data = []
-        for container in containers:
-            try:
-                gen_inf = container.find('h2', class_='listing-card__header__title mb-md-2 mb-0').a.text.strip().split()
-                brand = gen_inf[0]
-                year = gen_inf[-1]
-                
-                kms_driven = "0"
-                gen_inf1 = container.find('ul', class_='listing-card__attribute-list list-inline mb-0')
-                if gen_inf1:
-                    gen_inf2 = gen_inf1.find_all('li', class_='listing-card__attribute list-inline-item')
-                    if len(gen_inf2) > 1:
-                        kms_text = gen_inf2[1].text.strip()
-                        if 'km' in kms_text:
-                            kms_driven = kms_text.replace('km', '').strip()
-                
-                adress = container.find('div', class_='col-12 entry-zone-address').text.strip()
-                owner = container.find('p', class_='time-author m-0').a.text.replace('Par','').strip()
-                price = container.find('h3', 'listing-card__header__price font-weight-bold text-uppercase mb-0').text.strip()
-                price = "".join(price.split()).replace('FCFA','')
-                
-                dic = {
-                    "brand": brand, "year": year, "kilometer": kms_driven,
-                    "adress": adress, "owner": owner, "price": price
-                }
-                data.append(dic)
-            except:
-                continue
-        
-        DF = pd.DataFrame(data)
-        df = pd.concat([df, DF], ignore_index=True)
     
-    df = df.drop_duplicates().reset_index(drop=True)
+    df = crawl_listings(category, num_pages, max_in_flight, known_keys, cache_mode, on_page)
     progress_bar.empty()
     status_text.empty()
     return df
 
-def scrape_location(num_pages):
-    df = pd.DataFrame()
-    progress_bar = st.progress(0)
-    status_text = st.empty()
+def scrape_voitures(num_pages, max_in_flight=MAX_IN_FLIGHT, known_keys=None, cache_mode=CACHE_USE):
+    return scrape_listings('voitures', num_pages, max_in_flight, known_keys, cache_mode)
+
+def scrape_motos(num_pages, max_in_flight=MAX_IN_FLIGHT, known_keys=None, cache_mode=CACHE_USE):
+    return scrape_listings('motos', num_pages, max_in_flight, known_keys, cache_mode)
+
+def scrape_location(num_pages, max_in_flight=MAX_IN_FLIGHT, known_keys=None, cache_mode=CACHE_USE):
+    return scrape_listings('location', num_pages, max_in_flight, known_keys, cache_mode)
+
+# Detail-page enrichment: save_to_db queues every listing seen for the first time in
+# listing_details, and enrich_listings() fetches only those pending pages, on a bounded
+# pool and no faster than one request per DETAIL_HOST_INTERVAL seconds per host
+DETAIL_BATCH = 200
+DETAIL_MAX_IN_FLIGHT = 4
+DETAIL_HOST_INTERVAL = float(os.environ.get('DAKAR_AUTO_HOST_INTERVAL', '0.5'))
+REFERENCE_PATTERN = re.compile(r'\bR[ée]f(?:[ée]rence)?\s*[.:#]?\s*(\w+)', re.IGNORECASE)
+POSTED_PATTERN = re.compile(r'\b(?:Publi[ée]e?|Post[ée]e?) le\s+([\d/.-]+(?:\s+(?:à\s+)?\d{1,2}[:h]\d{2})?)', re.IGNORECASE)
+
+def _text(element):
+    return " ".join(element.text_content().split()).rstrip(':').strip()
+
+def parse_detail_page(content):
+    # The detail markup is read generically: label/value pairs of definition lists,
+    # two-cell table rows and "Label: value" list items all become specs
+    from lxml import etree
+    detail = {'reference': None, 'posted_at': None, 'specs': {}, 'description': None}
+    try:
+        root = parse_html(content)
+    except (etree.ParserError, ValueError):
+        return detail
+    specs = detail['specs']
+    for term in root.iter('dt'):
+        value = term.getnext()
+        if value is not None and value.tag == 'dd':
+            specs[_text(term)] = _text(value)
+    for row in root.iter('tr'):
+        cells = [_text(cell) for cell in row if cell.tag in ('th', 'td')]
+        if len(cells) == 2 and cells[0]:
+            specs[cells[0]] = cells[1]
+    for item in root.iter('li'):
+        label, separator, value = " ".join(item.text_content().split()).partition(':')
+        if separator and label.strip() and value.strip() and len(label) <= 40:
+            specs.setdefault(label.strip(), value.strip())
     
-    for index in range(1, num_pages + 1):
-        status_text.text(f'Scraping page {index}/{num_pages}...')
-        progress_bar.progress(index / num_pages)
-        
-        url = f'https://dakar-auto.com/senegal/location-de-voitures-19?&page={index}'
-        res = get(url)
-        soup = bs(res.content, 'html.parser')
-        containers = soup.find_all('div', class_='listings-cards__list-item mb-md-3 mb-3')
-        
-        data = []
-        for container in containers:
-            try:
-                gen_inf = container.find('h2', class_='listing-card__header__title mb-md-2 mb-0').a.text.strip().split()
-                brand = gen_inf[0]
-                year = gen_inf[-1]
-                
-                owner = container.find('p', class_='time-author m-0').a.text.replace('Par','').strip()
-                adress = container.find('div', class_='col-12 entry-zone-address').text.strip()
-                price = container.find('h3','listing-card__header__price font-weight-bold text-uppercase mb-0').text.strip()
-                price = "".join(price.split()).replace('FCFA','')
-                
-                dic = {
-                    "brand": brand, "year": year, "adress": adress,
-                    "owner": owner, "price": price
-                }
-                data.append(dic)
-            except:
-                continue
-        
-        DF = pd.DataFrame(data)
-        df = pd.concat([df, DF], ignore_index=True)
+    # Text nodes joined with spaces, so words of adjacent elements do not run together
+    text = " ".join(" ".join(root.itertext()).split())
+    reference = REFERENCE_PATTERN.search(text)
+    detail['reference'] = reference.group(1) if reference else None
+    posted = root.xpath('//time/@datetime') or [match.group(1) for match in POSTED_PATTERN.finditer(text)]
+    detail['posted_at'] = posted[0].strip() if posted else None
+    description = root.xpath("//meta[@name='description']/@content | //meta[@property='og:description']/@content")
+    detail['description'] = description[0].strip() if description else None
+    return detail
+
+def enrich_listings(table_name, limit=DETAIL_BATCH, max_in_flight=DETAIL_MAX_IN_FLIGHT, cache_mode=CACHE_USE):
+    # Enriches one batch of pending listings and returns how many were settled.
+    # A page that is not cached in offline replay stays pending.
+    pending = query_db(
+        "SELECT listing_key, url FROM listing_details WHERE category = ? AND status = 'pending' LIMIT ?",
+        (table_name, limit), name='pending_details'
+    )
+    if len(pending) == 0:
+        return 0
+    updates = []
+    with timed('dakar_auto_stage_seconds', stage='enrich', table=table_name):
+        pages = fetch_pages(pending['url'].tolist(), max_in_flight, cache_mode, DETAIL_HOST_INTERVAL)
+        for key, (content, error) in zip(pending['listing_key'], pages):
+            fetched_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            if error is not None:
+                updates.append(('failed', None, None, None, None, str(error), fetched_at, table_name, key))
+            elif content:
+                detail = parse_detail_page(content)
+                updates.append(('done', detail['reference'], detail['posted_at'],
+                                json.dumps(detail['specs'], ensure_ascii=False), detail['description'],
+                                None, fetched_at, table_name, key))
+        with db_connection() as conn:
+            with conn:
+                conn.executemany(
+                    "UPDATE listing_details SET status = ?, reference = ?, posted_at = ?, specs = ?, description = ?, "
+                    "error = ?, fetched_at = ? WHERE category = ? AND listing_key = ?",
+                    updates
+                )
+    increment('dakar_auto_rows_total', len(updates), stage='enrich', table=table_name)
+    return len(updates)
+
+def enrich_all(table_name, max_in_flight=DETAIL_MAX_IN_FLIGHT, cache_mode=CACHE_USE):
+    total = 0
+    while True:
+        settled = enrich_listings(table_name, max_in_flight=max_in_flight, cache_mode=cache_mode)
+        if settled == 0:
+            return total
+        total += settled
+
+def retry_failed_details(table_name):
+    with db_connection() as conn:
+        with conn:
+            conn.execute(
+                "UPDATE listing_details SET status = 'pending', error = NULL WHERE category = ? AND status = 'failed'",
+                (table_name,)
+            )
+
+def detail_counts(table_name):
+    df = query_db(
+        "SELECT status, COUNT(*) AS count FROM listing_details WHERE category = ? GROUP BY status",
+        (table_name,), name='detail_counts'
+    )
+    return dict(zip(df['status'], df['count'])) if len(df) > 0 else {}
+
+def load_details(table_name, limit=DETAIL_BATCH):
+    return query_db(
+        "SELECT t.brand, t.year, t.price, d.reference, d.posted_at, d.specs, d.description, d.url "
+        f"FROM listing_details d JOIN {table_name} t ON t.listing_key = d.listing_key "
+        "WHERE d.category = ? AND d.status = 'done' ORDER BY d.fetched_at DESC LIMIT ?",
+        (table_name, limit), name='load_details'
+    )
+
+# Pre-scraped web-scraper exports bundled in data/
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+BUNDLED_EXPORTS = {
+    'voitures': 'auto_voiture_scraper.csv',
+    'motos': 'motos_and_scooters.csv',
+    'location': 'location_de_voiture.csv',
+}
+
+def normalize_scraper_export(category, path):
+    # Map a web-scraper export onto the listing schema with column-wide string ops:
+    # split brand_year, strip "Par", compact "4 500 000 F CFA" like the live scraper.
+    raw = pd.read_csv(path, encoding='utf-8-sig', dtype=str)
+    title = raw['brand_year'].fillna('').str.split()
+    df = pd.DataFrame(index=raw.index)
+    df['brand'] = title.str[0]
+    df['model'] = title.str[1:-1].str.join(' ')
+    df['year'] = title.str[-1]
     
-    df = df.drop_duplicates().reset_index(drop=True)
-    progress_bar.empty()
-    status_text.empty()
+    if category == 'voitures':
+        kms = raw['kms'].fillna('')
+        has_kms = kms.str.contains('km', regex=False)
+        df['kilometer'] = kms.str.replace('km', '', regex=False).str.strip().where(has_kms)
+        # Without a km attribute the export shifts gearbox and fuel one column left
+        df['fuel_type'] = raw['fuel'].where(has_kms, raw['geabox'])
+        df['gearbox'] = raw['geabox'].where(has_kms, raw['kms'])
+        df['adress'] = raw['adress'].str.strip()
+    elif category == 'motos':
+        # The motos export has no kilometers (the scraper's default), and its address column repeats the owner
+        df['kilometer'] = '0'
+        df['adress'] = raw['address'].str.strip().mask(raw['address'].str.startswith('Par', na=False))
+    else:
+        df['adress'] = raw['address'].str.strip()
+    
+    df['owner'] = raw['owner'].str.replace('Par', '', regex=False).str.strip()
+    df['price'] = raw['price'].str.replace(r'\s+', '', regex=True).str.replace('FCFA', '', regex=False)
+    # The exports do not keep the listing links
+    df['url'] = pd.Series(pd.NA, index=raw.index, dtype='string')
+    df = df[[name for name, _, _, _ in LISTING_SPECS[category]['fields']]]
+    df = normalize_numeric_columns(df)
+    df['listing_key'] = listing_keys(df, LISTING_SPECS[category]['key'])
+    rows = len(df)
+    df = distinct_listings(df)
+    df.attrs['repeated'] = rows - len(df)
     return df
 
+@st.cache_data
+def cached_bundled_export(category, mtime):
+    return normalize_scraper_export(category, os.path.join(DATA_DIR, BUNDLED_EXPORTS[category]))
+
+def load_bundled_export(category):
+    # Cached per file version, so reruns and sessions share one parsed copy
+    path = os.path.join(DATA_DIR, BUNDLED_EXPORTS[category])
+    return cached_bundled_export(category, os.path.getmtime(path))
+
+def import_bundled_exports():
+    # Returns {category: (listings imported, repeated cards skipped)}
+    counts = {}
+    for category in BUNDLED_EXPORTS:
+        df = load_bundled_export(category).copy()
+        save_to_db(df, category)
+        counts[category] = (len(df), df.attrs.get('repeated', 0))
+    return counts
+
+# Columnar snapshot store: every scrape run is also appended to a Parquet dataset
+# partitioned by category and scrape date, so history can be read column by column
+SNAPSHOT_DIR = os.environ.get('DAKAR_AUTO_SNAPSHOTS', 'snapshots')
+SNAPSHOT_PARTITION_SCHEMA = pa.schema([('category', pa.string()), ('scrape_date', pa.date32())])
+
+def snapshot_partitioning():
+    import pyarrow.dataset as ds
+    return ds.partitioning(SNAPSHOT_PARTITION_SCHEMA, flavor='hive')
+
+def snapshot_schema(category):
+    fields = [name for name, _, _, _ in LISTING_SPECS[category]['fields']]
+    columns = [(name, pa.int64() if name in NUMERIC_FIELDS else pa.string()) for name in fields]
+    columns += [(f'{name}_raw', pa.string()) for name in NUMERIC_FIELDS if name in fields]
+    columns += [('listing_key', pa.string()), ('scraped_at', pa.timestamp('s'))]
+    return pa.schema(columns)
+
+def write_snapshot(df, category, scraped_at=None):
+    if len(df) == 0:
+        return
+    scraped_at = (scraped_at or datetime.now()).replace(microsecond=0)
+    schema = snapshot_schema(category)
+    frame = df.reindex(columns=schema.names)
+    frame['scraped_at'] = scraped_at
+    table = pa.Table.from_pandas(frame, schema=schema, preserve_index=False)
+    table = table.append_column('category', pa.array([category] * len(frame), pa.string()))
+    table = table.append_column('scrape_date', pa.array([scraped_at.date()] * len(frame), pa.date32()))
+    # A unique file name per run, so runs on the same day add files instead of replacing them
+    import pyarrow.dataset as ds
+    with timed('dakar_auto_stage_seconds', stage='snapshot', table=category):
+        ds.write_dataset(
+            table, SNAPSHOT_DIR, format='parquet', partitioning=snapshot_partitioning(),
+            basename_template=f"{time.time_ns()}-{{i}}.parquet",
+            existing_data_behavior='overwrite_or_ignore'
+        )
+
+def snapshot_dataset_schema(category):
+    schema = snapshot_schema(category)
+    for field in SNAPSHOT_PARTITION_SCHEMA:
+        schema = schema.append(field)
+    return schema
+
+def snapshot_dataset(category):
+    # An explicit schema skips footer inference, and the memory-mapped filesystem
+    # lets Arrow read column chunks straight from the page cache
+    import pyarrow.dataset as ds
+    from pyarrow import fs
+    return ds.dataset(
+        SNAPSHOT_DIR, schema=snapshot_dataset_schema(category), format='parquet', partitioning=snapshot_partitioning(),
+        filesystem=fs.LocalFileSystem(use_mmap=True)
+    )
+
+def snapshot_filter(category, start=None, end=None):
+    # Only partition fields, so whole directories are pruned before any file is opened
+    import pyarrow.dataset as ds
+    condition = ds.field('category') == category
+    if start is not None:
+        condition = condition & (ds.field('scrape_date') >= pa.scalar(start, pa.date32()))
+    if end is not None:
+        condition = condition & (ds.field('scrape_date') <= pa.scalar(end, pa.date32()))
+    return condition
+
+def load_snapshots(category, columns=None, start=None, end=None):
+    if not os.path.isdir(SNAPSHOT_DIR):
+        table = snapshot_dataset_schema(category).empty_table()
+        return table if columns is None else table.select(columns)
+    with timed('dakar_auto_stage_seconds', stage='snapshot_read', table=category):
+        return snapshot_dataset(category).to_table(columns=columns, filter=snapshot_filter(category, start, end))
+
+def snapshot_dates(category):
+    if not os.path.isdir(SNAPSHOT_DIR):
+        return []
+    import pyarrow.dataset as ds
+    fragments = snapshot_dataset(category).get_fragments(filter=snapshot_filter(category))
+    return sorted({ds.get_partition_keys(fragment.partition_expression)['scrape_date'] for fragment in fragments})
+
+def snapshot_price_history(category, start=None, end=None):
+    # Reads two columns of the selected days and aggregates in Arrow
+    table = load_snapshots(category, ['scrape_date', 'price'], start, end)
+    if table.num_rows == 0:
+        return pd.DataFrame(columns=['scrape_date', 'listings', 'median_price'])
+    history = table.group_by('scrape_date').aggregate([('price', 'count'), ('price', 'approximate_median')])
+    history = history.to_pandas().rename(columns={'price_count': 'listings', 'price_approximate_median': 'median_price'})
+    return history.sort_values('scrape_date').reset_index(drop=True)
+
+def snapshot_parquet(category, start=None, end=None):
+    import pyarrow.parquet as pq
+    buffer = io.BytesIO()
+    pq.write_table(load_snapshots(category, start=start, end=end), buffer)
+    return buffer.getvalue()
+
+# Exports: built only when a download button is clicked, streamed out of SQLite in
+# chunks, and kept in the shared result cache until the table is next written
+EXPORT_CHUNK_ROWS = 50000
+EXPORT_FORMATS = {
+    'CSV': ('csv', 'text/csv'),
+    'CSV (gzip)': ('csv.gz', 'application/gzip'),
+    'Parquet': ('parquet', 'application/octet-stream'),
+}
+SQLITE_ARROW_TYPES = {'INTEGER': pa.int64(), 'REAL': pa.float64()}
+
+def table_arrow_schema(conn, table_name):
+    # Declared column types, so a chunk whose column is all NULL keeps the same schema
+    return pa.schema([
+        (row[1], SQLITE_ARROW_TYPES.get(row[2], pa.string()))
+        for row in conn.execute(f"PRAGMA table_info({table_name})")
+    ])
+
+def write_export(chunks, extension, buffer, schema=None):
+    if extension == 'parquet':
+        import pyarrow.parquet as pq
+        writer = None
+        for chunk in chunks:
+            table = pa.Table.from_pandas(chunk, schema=schema, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(buffer, table.schema)
+            writer.write_table(table)
+        if writer is not None:
+            writer.close()
+        elif schema is not None:
+            pq.write_table(schema.empty_table(), buffer)
+        return
+    
+    out = gzip.GzipFile(fileobj=buffer, mode='wb') if extension == 'csv.gz' else buffer
+    for index, chunk in enumerate(chunks):
+        out.write(chunk.to_csv(index=False, header=index == 0).encode('utf-8'))
+    if out is not buffer:
+        out.close()
+
+@shared_result
+def table_export(table_name, extension, filters=(), search=''):
+    # Exports what View Data shows: the rows under filters, narrowed to the matches of
+    # search when there is one (every match, not only the SEARCH_LIMIT best), in id order
+    buffer = io.BytesIO()
+    with timed('dakar_auto_stage_seconds', stage='export', table=table_name), db_connection() as conn:
+        if search:
+            source = search_source(conn, table_name, search, filters)
+            from_where, params = source[:2] if source else (f"{table_name} t WHERE 0", ())
+        else:
+            where, params = filter_clause(filters)
+            from_where = f"{table_name} t WHERE {where}"
+        chunks = pd.read_sql_query(
+            f"SELECT t.* FROM {from_where} ORDER BY t.id", conn, params=params, chunksize=EXPORT_CHUNK_ROWS
+        )
+        write_export(chunks, extension, buffer, table_arrow_schema(conn, table_name))
+    return buffer.getvalue()
+
+@st.cache_data
+def cached_bundled_export_file(category, mtime, extension):
+    df = cached_bundled_export(category, mtime)
+    buffer = io.BytesIO()
+    write_export((df.iloc[start:start + EXPORT_CHUNK_ROWS] for start in range(0, len(df), EXPORT_CHUNK_ROWS)),
+                 extension, buffer)
+    return buffer.getvalue()
+
+def bundled_export_file(category, extension):
+    path = os.path.join(DATA_DIR, BUNDLED_EXPORTS[category])
+    return cached_bundled_export_file(category, os.path.getmtime(path), extension)
+
+# Background scrape jobs
+JOB_WORKERS = 3
+ACTIVE_JOB_STATUSES = ('queued', 'running')
+STREAM_CHUNK_ROWS = 500
+STREAM_FLUSH_INTERVAL = 2.0
+LIVE_ROWS = 200
+RESUMABLE_JOB_STATUSES = ('interrupted', 'failed', 'incomplete')
+
+@st.cache_resource
+def get_job_executor():
+    # Created once per server process, so jobs still marked active in the
+    # database belong to a process that is gone.
+    with db_connection() as conn:
+        with conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'interrupted', finished_at = ? WHERE status IN ('queued', 'running')",
+                (datetime.now().strftime("%Y-%m-%d %H:%M:%S"),)
+            )
+    return ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix='scrape-job')
+
+def update_job(job_id, **fields):
+    assignments = ", ".join(f"{column} = ?" for column in fields)
+    with db_connection() as conn:
+        with conn:
+            conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+
+def load_job(job_id):
+    df = query_db("SELECT * FROM jobs WHERE id = ?", (job_id,), name='load_job')
+    return df.iloc[0].to_dict() if len(df) > 0 else None
+
+def list_jobs(limit=10):
+    return query_db("SELECT * FROM jobs ORDER BY id DESC LIMIT ?", (limit,), name='list_jobs')
+
+def save_checkpoint(job_id, page, status, records=None, error=None):
+    with db_connection() as conn:
+        with conn:
+            conn.execute(
+                "INSERT INTO crawl_pages (job_id, page, status, attempts, rows, records, error, finished_at) "
+                "VALUES (?, ?, ?, 1, ?, ?, ?, ?) "
+                "ON CONFLICT(job_id, page) DO UPDATE SET status = excluded.status, attempts = attempts + 1, "
+                "rows = excluded.rows, records = excluded.records, error = excluded.error, finished_at = excluded.finished_at",
+                (job_id, page, status, len(records or []), json.dumps(records) if records is not None else None,
+                 error, datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+            )
+
+def load_checkpoints(job_id):
+    # Row count of every page of the job that already finished, keyed by page number
+    with db_connection() as conn:
+        rows = conn.execute(
+            "SELECT page, rows FROM crawl_pages WHERE job_id = ? AND status = 'done'", (job_id,)
+        ).fetchall()
+    return dict(rows)
+
+def job_rows(job_id, limit=LIVE_ROWS):
+    # The latest rows a job has stored, read back from its page checkpoints
+    pages = []
+    rows = 0
+    with db_connection() as conn:
+        cursor = conn.execute(
+            "SELECT records, rows FROM crawl_pages WHERE job_id = ? AND status = 'done' AND rows > 0 "
+            "ORDER BY finished_at DESC, page DESC",
+            (job_id,)
+        )
+        for page_records, page_rows in cursor:
+            pages.append(json.loads(page_records))
+            rows += page_rows
+            if rows >= limit:
+                break
+    records = [record for page_records in reversed(pages) for record in page_records]
+    return pd.DataFrame(records[-limit:])
+
+def submit_job(category, num_pages, max_in_flight=MAX_IN_FLIGHT, incremental=False, cache_mode=CACHE_USE, enrich=False):
+    executor = get_job_executor()
+    options = {'max_in_flight': int(max_in_flight), 'incremental': bool(incremental), 'cache_mode': cache_mode,
+               'enrich': bool(enrich)}
+    with db_connection() as conn:
+        with conn:
+            cursor = conn.execute(
+                "INSERT INTO jobs (category, num_pages, options, status, pages_done, rows, created_at) "
+                "VALUES (?, ?, ?, 'queued', 0, 0, ?)",
+                (category, int(num_pages), json.dumps(options), datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+            )
+            job_id = cursor.lastrowid
+    executor.submit(run_job, job_id)
+    return job_id
+
+def resume_job(job_id):
+    # Re-queue an interrupted, failed or incomplete job; run_job skips its checkpointed pages
+    update_job(job_id, status='queued', error=None, finished_at=None)
+    get_job_executor().submit(run_job, job_id)
+
+def run_job(job_id):
+    # Runs on a job worker thread: no Streamlit calls, progress goes to the jobs table.
+    # Parsed pages are buffered and written in chunks (STREAM_CHUNK_ROWS rows or
+    # STREAM_FLUSH_INTERVAL seconds, whichever comes first); a page is checkpointed in
+    # crawl_pages once its chunk is stored, so a resumed job only fetches the pages
+    # that never made it to the database. Only the current chunk is held in memory.
+    job = load_job(job_id)
+    options = json.loads(job['options'])
+    table_name = job['category']
+    scraped_at = datetime.now()
+    update_job(job_id, status='running', started_at=scraped_at.strftime("%Y-%m-%d %H:%M:%S"))
+    done_pages = load_checkpoints(job_id)
+    rows_saved = sum(done_pages.values())
+    failed_pages = []
+    chunk = []
+    flushed_at = time.monotonic()
+    
+    def flush():
+        nonlocal rows_saved, flushed_at
+        records = [record for _, page_records in chunk for record in page_records]
+        if records:
+            save_to_db(pd.DataFrame(records), table_name)
+            # Only this run's pages: earlier runs of a resumed job already wrote theirs
+            write_snapshot(listing_frame(table_name, records), table_name, scraped_at)
+        for index, page_records in chunk:
+            save_checkpoint(job_id, index, 'done', page_records)
+            done_pages[index] = len(page_records)
+        rows_saved += len(records)
+        chunk.clear()
+        flushed_at = time.monotonic()
+        update_job(job_id, pages_done=len(done_pages), rows=rows_saved)
+    
+    def on_error(index, error):
+        save_checkpoint(job_id, index, 'failed', error=str(error))
+        failed_pages.append(index)
+    
+    try:
+        known_keys = load_listing_keys(table_name) if options['incremental'] else None
+        pages = iter_listings(
+            table_name, int(job['num_pages']), options['max_in_flight'],
+            known_keys, options['cache_mode'], set(done_pages), on_error
+        )
+        for index, page_records in pages:
+            chunk.append((index, page_records))
+            if (sum(len(records) for _, records in chunk) >= STREAM_CHUNK_ROWS
+                    or time.monotonic() - flushed_at >= STREAM_FLUSH_INTERVAL):
+                flush()
+        flush()
+        if options.get('enrich'):
+            enriched = enrich_all(table_name, min(options['max_in_flight'], DETAIL_MAX_IN_FLIGHT), options['cache_mode'])
+            # An enrichment-only job (no pages to crawl) reports the listings it enriched as its rows
+            if int(job['num_pages']) == 0:
+                rows_saved = enriched
+        if failed_pages:
+            update_job(job_id, status='incomplete', rows=rows_saved,
+                       error=f"{len(failed_pages)} page(s) failed: {', '.join(map(str, failed_pages))}",
+                       finished_at=datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+        else:
+            update_job(job_id, status='done', rows=rows_saved, finished_at=datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+    except Exception as e:
+        update_job(job_id, status='failed', error=str(e), finished_at=datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+
+# Storage maintenance: listings not seen for RETENTION_DAYS move to the archive database,
+# finished jobs and their page checkpoints are dropped after JOB_RETENTION_DAYS, the
+# per-run snapshot files of past days are merged into one file per partition, and freed
+# pages are returned with an incremental vacuum. Runs every MAINTENANCE_INTERVAL seconds.
+ARCHIVE_PATH = os.environ.get('DAKAR_AUTO_ARCHIVE', 'daka_auto_archive.db')
+RETENTION_DAYS = int(os.environ.get('DAKAR_AUTO_RETENTION_DAYS', '180'))
+JOB_RETENTION_DAYS = int(os.environ.get('DAKAR_AUTO_JOB_RETENTION_DAYS', '30'))
+MAINTENANCE_INTERVAL = 6 * 3600
+
+def archive_listings(conn, table_name, cutoff):
+    # Copies the rows last seen before cutoff into archive.<table_name>, adding any
+    # column the archive copy is missing, then deletes them from the main table
+    columns = table_columns(conn, table_name)
+    conn.execute(f"CREATE TABLE IF NOT EXISTS archive.{table_name} AS SELECT * FROM main.{table_name} WHERE 0")
+    archived_columns = [row[1] for row in conn.execute(f"PRAGMA archive.table_info({table_name})")]
+    for column in columns:
+        if column not in archived_columns:
+            conn.execute(f"ALTER TABLE archive.{table_name} ADD COLUMN {column}")
+    column_list = ', '.join(columns)
+    archived = conn.execute(
+        f"INSERT INTO archive.{table_name} ({column_list}) SELECT {column_list} FROM main.{table_name} WHERE last_seen < ?",
+        (cutoff,)
+    ).rowcount
+    if archived:
+        # Listings whose canonical row is archived are linked again among the rows that stay
+        conn.execute(
+            f"UPDATE main.{table_name} SET canonical_id = NULL WHERE last_seen >= ? AND canonical_id IN "
+            f"(SELECT id FROM main.{table_name} WHERE last_seen < ?)", (cutoff, cutoff)
+        )
+        conn.execute(f"DELETE FROM main.{table_name} WHERE last_seen < ?", (cutoff,))
+        link_duplicates(conn, table_name)
+    return archived
+
+def prune_jobs(conn, cutoff):
+    finished = f"SELECT id FROM jobs WHERE finished_at < ? AND status NOT IN ({', '.join('?' for _ in ACTIVE_JOB_STATUSES)})"
+    conn.execute(f"DELETE FROM crawl_pages WHERE job_id IN ({finished})", (cutoff, *ACTIVE_JOB_STATUSES))
+    return conn.execute(f"DELETE FROM jobs WHERE id IN ({finished})", (cutoff, *ACTIVE_JOB_STATUSES)).rowcount
+
+def compact_snapshots():
+    # Today's partitions are skipped, a running job may still be adding files to them
+    import pyarrow.parquet as pq
+    if not os.path.isdir(SNAPSHOT_DIR):
+        return 0
+    today = datetime.now().date().isoformat()
+    compacted = 0
+    for category_dir in os.scandir(SNAPSHOT_DIR):
+        if not category_dir.is_dir():
+            continue
+        for date_dir in os.scandir(category_dir.path):
+            files = sorted(entry.path for entry in os.scandir(date_dir.path) if entry.name.endswith('.parquet'))
+            if date_dir.name.partition('=')[2] >= today or len(files) < 2:
+                continue
+            table = pa.concat_tables([pq.read_table(path) for path in files], promote_options='default')
+            # Written under a name the dataset reader ignores, then renamed into place
+            tmp_path = os.path.join(date_dir.path, f"_{time.time_ns()}.tmp")
+            pq.write_table(table, tmp_path)
+            os.replace(tmp_path, os.path.join(date_dir.path, f"{time.time_ns()}-compacted.parquet"))
+            for path in files:
+                os.remove(path)
+            compacted += len(files)
+    return compacted
+
+@st.cache_resource
+def get_maintenance_state():
+    return {'lock': threading.Lock(), 'last_run': None}
+
+def run_maintenance():
+    state = get_maintenance_state()
+    with state['lock'], timed('dakar_auto_stage_seconds', stage='maintenance', table='all'):
+        now = datetime.now()
+        result = {'started_at': now.strftime("%Y-%m-%d %H:%M:%S"), 'archived': {}}
+        listing_cutoff = (now - timedelta(days=RETENTION_DAYS)).strftime("%Y-%m-%d %H:%M:%S")
+        job_cutoff = (now - timedelta(days=JOB_RETENTION_DAYS)).strftime("%Y-%m-%d %H:%M:%S")
+        with db_connection() as conn:
+            conn.execute("ATTACH DATABASE ? AS archive", (ARCHIVE_PATH,))
+            try:
+                with conn:
+                    for table_name in LISTING_SPECS:
+                        result['archived'][table_name] = archive_listings(conn, table_name, listing_cutoff)
+                    result['jobs_pruned'] = prune_jobs(conn, job_cutoff)
+            finally:
+                conn.execute("DETACH DATABASE archive")
+            # A plain execute steps the pragma once and frees a single page; executescript
+            # runs it to completion and hands every free page back to the filesystem
+            free_pages = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            conn.executescript("PRAGMA incremental_vacuum")
+            result['pages_freed'] = free_pages - conn.execute("PRAGMA freelist_count").fetchone()[0]
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            conn.execute("PRAGMA optimize")
+        for table_name, archived in result['archived'].items():
+            if archived:
+                bump_write_version(table_name)
+        result['snapshot_files_compacted'] = compact_snapshots()
+        state['last_run'] = result
+    return result
+
+def maintenance_loop():
+    while True:
+        time.sleep(MAINTENANCE_INTERVAL)
+        try:
+            run_maintenance()
+        except Exception as e:
+            get_maintenance_state()['last_run'] = {'started_at': datetime.now().strftime("%Y-%m-%d %H:%M:%S"), 'error': str(e)}
+
+@st.cache_resource
+def start_maintenance():
+    # One maintenance thread per server process
+    thread = threading.Thread(target=maintenance_loop, name='dakar-auto-maintenance', daemon=True)
+    thread.start()
+    return thread
+
 # Initialize database
 init_db()
+start_maintenance()
+
+# Area filter shared by the Dashboard and View Data: a city, optionally narrowed to some
+# of its neighborhoods, becomes a location_id filter answered from the location_id index
+def area_filter(table_name, key):
+    locations = table_locations(table_name)
+    if len(locations) == 0:
+        return ()
+    col1, col2 = st.columns(2)
+    with col1:
+        city = st.selectbox(" City:", ["All"] + sorted(locations['city'].unique()), key=f"{key}_city")
+    if city == "All":
+        return ()
+    in_city = locations[locations['city'] == city]
+    with col2:
+        neighborhoods = st.multiselect(
+            " Neighborhoods:", [name for name in in_city['neighborhood'] if name], key=f"{key}_neighborhoods"
+        )
+    if neighborhoods:
+        in_city = in_city[in_city['neighborhood'].isin(neighborhoods)]
+    return (('location_id', tuple(int(location_id) for location_id in in_city['id'])),)
+
+# Sidebar facets shared by the Dashboard and View Data. They extend the area filter and
+# compile to one parameterised WHERE clause; each multiselect option shows how many
+# listings it matches under the other selections, counted from the facet indexes.
+FACET_LABELS = {'brand': " Brand:", 'fuel_type': " Fuel:", 'gearbox': " Gearbox:"}
+
+def facet_filters(table_name, key, filters=()):
+    filters = list(filters)
+    fields = [name for name, _, _, _ in LISTING_SPECS[table_name]['fields']]
+    with st.sidebar:
+        st.markdown("### Filters")
+        low, high = column_bounds(table_name, 'year')
+        if low is not None and high > low:
+            years = st.slider(" Year:", low, high, (low, high), key=f"{key}_{table_name}_year")
+            if years != (low, high):
+                filters.append(('year', years))
+        col1, col2 = st.columns(2)
+        with col1:
+            min_price = st.number_input(" Min price:", min_value=0, value=None, step=100000, key=f"{key}_{table_name}_min_price")
+        with col2:
+            max_price = st.number_input(" Max price:", min_value=0, value=None, step=100000, key=f"{key}_{table_name}_max_price")
+        if min_price is not None or max_price is not None:
+            filters.append(('price', (min_price, max_price)))
+        
+        # Widget values from the previous run, so every facet counts under the others' selections
+        facets = [column for column in FACET_LABELS if column in fields]
+        selections = [(column, tuple(st.session_state.get(f"{key}_{table_name}_{column}", ()))) for column in facets]
+        counted = tuple(filters) + tuple(selection for selection in selections if selection[1])
+        for column in facets:
+            counts = facet_counts(table_name, column, counted)
+            count = dict(zip(counts['value'], counts['count'])) if len(counts) > 0 else {}
+            selected = st.session_state.get(f"{key}_{table_name}_{column}", [])
+            values = st.multiselect(
+                FACET_LABELS[column], sorted(set(count) | set(selected)),
+                format_func=lambda value, count=count: f"{value} ({count.get(value, 0)})",
+                key=f"{key}_{table_name}_{column}"
+            )
+            if values:
+                filters.append((column, tuple(values)))
+    return tuple(filters)
 
 # Main title
 st.markdown("<h1> DAKAR AUTO SCRAPER </h1>", unsafe_allow_html=True)
@@ -301,7 +2253,7 @@ with st.sidebar:
     st.markdown("### Navigation")
     menu = st.radio(
         "",
-        [" Home", " Scraper", " Dashboard", " View Data", " Web Evaluation App"],
+        [" Home", " Scraper", " Dashboard", " View Data", " Performance", " Web Evaluation App"],
         label_visibility="collapsed"
     )
     
@@ -374,57 +2326,69 @@ if menu == " Home":
         if st.button(" View Location Data", key="view_location", use_container_width=True):
             st.session_state['show_csv'] = 'location'
     
+    if st.button(" Import all pre-scraped data into the database", key="import_csv", use_container_width=True):
+        try:
+            with st.spinner('Importing pre-scraped data...'):
+                counts = import_bundled_exports()
+            st.success("Imported " + ", ".join(f"{count} {category}" for category, (count, _) in counts.items()) + " listings"
+                       + f" ({sum(repeated for _, repeated in counts.values())} repeated cards skipped)")
+        except Exception as e:
+            st.error(f" Error importing data: {str(e)}")
+    
     # Display data based on button clicked
     if 'show_csv' in st.session_state:
         st.markdown("---")
         
         if st.session_state['show_csv'] == 'cars':
-            st.markdown("### Cars Data from GitHub")
+            st.markdown("### Pre-Scraped Cars Data")
             try:
                 with st.spinner('Loading cars data...'):
-                    df = pd.read_csv("https://raw.githubusercontent.com/Marie77464/MY_DATA_REPORT/refs/heads/master/data/auto_voiture_scraper.csv")
+                    df = load_bundled_export('voitures')
                     st.success(f"Loaded {len(df)} cars records")
                     st.dataframe(df, use_container_width=True)
-                    csv = df.to_csv(index=False).encode('utf-8')
+                    export_format = st.selectbox("Export format:", list(EXPORT_FORMATS), key="home_export_format")
+                    extension, mime = EXPORT_FORMATS[export_format]
                     st.download_button(
-                        label="Download Cars CSV",
-                        data=csv,
-                        file_name=f"cars_data_{datetime.now().strftime('%Y%m%d')}.csv",
-                        mime="text/csv"
+                        label=f"Download Cars {export_format}",
+                        data=lambda: bundled_export_file('voitures', extension),
+                        file_name=f"cars_data_{datetime.now().strftime('%Y%m%d')}.{extension}",
+                        mime=mime
                     )
             except Exception as e:
                 st.error(f" Error loading data: {str(e)}")
         
         elif st.session_state['show_csv'] == 'motos':
-            st.markdown("### Motos Data from GitHub")
+            st.markdown("### Pre-Scraped Motos Data")
             try:
                 with st.spinner('Loading motos data...'):
-                    df = pd.read_csv("https://raw.githubusercontent.com/Marie77464/MY_DATA_REPORT/refs/heads/master/data/motos_and_scooters.csv")
+                    df = load_bundled_export('motos')
                     st.success(f"Loaded {len(df)} motos records")
                     st.dataframe(df, use_container_width=True)
-                    csv = df.to_csv(index=False).encode('utf-8')
+                    export_format = st.selectbox("Export format:", list(EXPORT_FORMATS), key="home_export_format")
+                    extension, mime = EXPORT_FORMATS[export_format]
                     st.download_button(
-                        label="Download Motos CSV",
-                        data=csv,
-                        file_name=f"motos_data_{datetime.now().strftime('%Y%m%d')}.csv",
-                        mime="text/csv"
+                        label=f"Download Motos {export_format}",
+                        data=lambda: bundled_export_file('motos', extension),
+                        file_name=f"motos_data_{datetime.now().strftime('%Y%m%d')}.{extension}",
+                        mime=mime
                     )
             except Exception as e:
                 st.error(f" Error loading data: {str(e)}")
         
         elif st.session_state['show_csv'] == 'location':
-            st.markdown("### Location Data from GitHub")
+            st.markdown("### Pre-Scraped Location Data")
             try:
                 with st.spinner('Loading location data...'):
-                    df = pd.read_csv("https://raw.githubusercontent.com/Marie77464/MY_DATA_REPORT/refs/heads/master/data/location_de_voiture.csv")
+                    df = load_bundled_export('location')
                     st.success(f"Loaded {len(df)} rental cars records")
                     st.dataframe(df, use_container_width=True)
-                    csv = df.to_csv(index=False).encode('utf-8')
+                    export_format = st.selectbox("Export format:", list(EXPORT_FORMATS), key="home_export_format")
+                    extension, mime = EXPORT_FORMATS[export_format]
                     st.download_button(
-                        label="Download Location CSV",
-                        data=csv,
-                        file_name=f"location_data_{datetime.now().strftime('%Y%m%d')}.csv",
-                        mime="text/csv"
+                        label=f"Download Location {export_format}",
+                        data=lambda: bundled_export_file('location', extension),
+                        file_name=f"location_data_{datetime.now().strftime('%Y%m%d')}.{extension}",
+                        mime=mime
                     )
             except Exception as e:
                 st.error(f" Error loading data: {str(e)}")
@@ -438,52 +2402,85 @@ elif menu == " Scraper":
     with col1:
         url_choice = st.selectbox(
             " Select data source:",
-            [" Voitures (Cars)", " Motos & Scooters", " Location de Voitures (Car Rental)"]
+            [" Voitures (Cars)", " Motos & Scooters", " Location de Voitures (Car Rental)", " All categories"]
+        )
+        incremental = st.checkbox(
+            " Incremental crawl (stop at already-known listings)",
+            help="Stops paginating once a page only contains listings already in the database."
+        )
+        cache_choice = st.radio(
+            " Page cache:",
+            ["Use cache", "Bypass cache", "Offline replay"],
+            horizontal=True,
+            help=f"Cached pages younger than {CACHE_TTL // 60} minutes are reused, older ones are revalidated "
+                 "with ETag/Last-Modified. Offline replay parses cached pages only, without any network access."
+        )
+        cache_mode = {"Use cache": CACHE_USE, "Bypass cache": CACHE_BYPASS, "Offline replay": CACHE_REPLAY}[cache_choice]
+        enrich = st.checkbox(
+            " Enrich new listings from their detail pages",
+            help=f"After the crawl, fetches the detail page of every listing not enriched yet, "
+                 f"at most one request every {DETAIL_HOST_INTERVAL:g}s per host."
         )
     
     with col2:
         num_pages = st.number_input(" Number of pages:", min_value=1, max_value=50, value=1)
+        max_in_flight = st.number_input(" Concurrent requests:", min_value=1, max_value=MAX_IN_FLIGHT_LIMIT, value=MAX_IN_FLIGHT)
     
     st.markdown("---")
     
     if st.button(" Start Scraping", use_container_width=True):
-        with st.spinner(' Scraping in progress...'):
-            try:
-                if "Voitures" in url_choice and "Location" not in url_choice:
-                    df = scrape_voitures(num_pages)
-                    if len(df) > 0:
-                        save_to_db(df, 'voitures')
-                        st.success(f'Successfully scraped {len(df)} cars!')
-                        st.balloons()
-                        st.dataframe(df, use_container_width=True)
-                    else:
-                        st.warning(" No data found. Please try again.")
-                
-                elif "Motos" in url_choice:
-                    df = scrape_motos(num_pages)
-                    if len(df) > 0:
-                        save_to_db(df, 'motos')
-                        st.success(f'Successfully scraped {len(df)} motos!')
-                        st.balloons()
-                        st.dataframe(df, use_container_width=True)
-                    else:
-                        st.warning(" No data found. Please try again.")
-                
-                elif "Location" in url_choice:
-                    df = scrape_location(num_pages)
-                    if len(df) > 0:
-                        save_to_db(df, 'location')
-                        st.success(f'Successfully scraped {len(df)} rental cars!')
-                        st.balloons()
-                        st.dataframe(df, use_container_width=True)  # Corrigé ici
-                    else:
-                        st.warning(" No data found. Please try again.")
-            
-            except Exception as e:
-                st.error(f' Error during scraping: {str(e)}')
+        if "All" in url_choice:
+            categories = ['voitures', 'motos', 'location']
+        elif "Voitures" in url_choice and "Location" not in url_choice:
+            categories = ['voitures']
+        elif "Motos" in url_choice:
+            categories = ['motos']
+        else:
+            categories = ['location']
+        for category in categories:
+            job_id = submit_job(category, num_pages, max_in_flight, incremental, cache_mode, enrich)
+            st.success(f"Scraping job #{job_id} ({category}) started in the background. You can keep using the app.")
+    
+    # Jobs run on server worker threads; this fragment only polls their state
+    get_job_executor()
+    
+    @st.fragment(run_every=2)
+    def show_jobs():
+        jobs = list_jobs(10)
+        if len(jobs) == 0:
+            return
+        st.markdown("### Scraping Jobs")
+        for job in jobs.to_dict('records'):
+            if job['status'] in ACTIVE_JOB_STATUSES and job['num_pages'] == 0:
+                st.info(f"Job #{job['id']} ({job['category']}): enriching pending detail pages ({job['status']})")
+            elif job['status'] in ACTIVE_JOB_STATUSES:
+                st.progress(
+                    min(job['pages_done'] / job['num_pages'], 1.0),
+                    text=f"Job #{job['id']} ({job['category']}): page {job['pages_done']}/{job['num_pages']}, {job['rows']} rows saved"
+                )
+                # Rows appear here as soon as their chunk is stored, not at the end of the crawl
+                live = job_rows(job['id'])
+                if len(live) > 0:
+                    st.dataframe(live.iloc[::-1], use_container_width=True, hide_index=True, height=250)
+            elif job['status'] == 'failed':
+                st.error(f" Job #{job['id']} ({job['category']}) failed after page {job['pages_done']}: {job['error']}")
+            elif job['status'] == 'incomplete':
+                st.warning(f" Job #{job['id']} ({job['category']}) finished with missing pages: {job['error']}")
+            if job['status'] in RESUMABLE_JOB_STATUSES:
+                if st.button(f" Resume job #{job['id']} ({job['pages_done']}/{job['num_pages']} pages done)", key=f"resume_{job['id']}"):
+                    resume_job(job['id'])
+                    st.rerun(scope="fragment")
+        st.dataframe(
+            jobs[['id', 'category', 'status', 'pages_done', 'num_pages', 'rows', 'created_at', 'finished_at']],
+            use_container_width=True,
+            hide_index=True
+        )
+    
+    show_jobs()
 
 # DASHBOARD PAGE
 elif menu == " Dashboard":
+    import plotly.express as px
     st.markdown("## Data Analytics Dashboard")
     
     data_type = st.selectbox(
@@ -492,56 +2489,57 @@ elif menu == " Dashboard":
     )
     
     table_map = {"Voitures": "voitures", "Motos": "motos", "Location": "location"}
-    df = load_from_db(table_map[data_type])
+    table_name = table_map[data_type]
+    filters = facet_filters(table_name, 'dashboard', area_filter(table_name, 'dashboard'))
+    with timed('dakar_auto_stage_seconds', stage='chart_metrics', table=table_name):
+        metrics = dashboard_metrics(table_name, filters)
     
-    if len(df) > 0:
-        df_clean = df.drop(['scraped_date', 'id'], axis=1, errors='ignore')
-        
+    if metrics['total'] > 0:
         # Metrics
         col1, col2, col3, col4 = st.columns(4)
         with col1:
-            st.metric(" Total Records", len(df_clean))
+            duplicates = int(metrics['total']) - int(metrics['unique_listings'])
+            st.metric(" Total Records", int(metrics['total']), delta=f"{duplicates} near-duplicates",
+                      delta_color="off")
         with col2:
-            st.metric(" Unique Brands", df_clean['brand'].nunique())
+            st.metric(" Unique Brands", int(metrics['brands']))
         with col3:
-            if 'price' in df_clean.columns:
-                try:
-                    avg_price = df_clean['price'].str.replace(',', '').astype(float).mean()
-                    st.metric(" Avg Price (FCFA)", f"{avg_price:,.0f}")
-                except:
-                    st.metric(" Avg Price (FCFA)", "N/A")
+            avg_price = metrics['avg_price']
+            st.metric(" Avg Price (FCFA)", f"{avg_price:,.0f}" if pd.notna(avg_price) else "N/A")
         with col4:
-            st.metric(" Latest Year", df_clean['year'].max() if 'year' in df_clean.columns else "N/A")
+            latest_year = metrics['latest_year']
+            st.metric(" Latest Year", int(latest_year) if pd.notna(latest_year) else "N/A")
         
         st.markdown("---")
         
         col1, col2 = st.columns(2)
         
         with col1:
-            brand_counts = df_clean['brand'].value_counts().head(10)
-            fig1 = px.bar(
-                x=brand_counts.values,
-                y=brand_counts.index,
-                orientation='h',
-                title="Top 10 Brands",
-                labels={'x': 'Count', 'y': 'Brand'},
-                color=brand_counts.values,
-                color_continuous_scale='YlOrRd'
-            )
-            fig1.update_layout(
-                showlegend=False,
-                plot_bgcolor='rgba(26, 32, 44, 0.8)',
-                paper_bgcolor='rgba(26, 32, 44, 0.8)',
-                font=dict(color='#FFD700')
-            )
-            st.plotly_chart(fig1, use_container_width=True)
+            with timed('dakar_auto_stage_seconds', stage='chart_top_brands', table=table_name):
+                brand_counts = top_brands(table_name, 10, filters)
+                fig1 = px.bar(
+                    x=brand_counts['count'],
+                    y=brand_counts['brand'],
+                    orientation='h',
+                    title="Top 10 Brands",
+                    labels={'x': 'Count', 'y': 'Brand'},
+                    color=brand_counts['count'],
+                    color_continuous_scale='YlOrRd'
+                )
+                fig1.update_layout(
+                    showlegend=False,
+                    plot_bgcolor='rgba(26, 32, 44, 0.8)',
+                    paper_bgcolor='rgba(26, 32, 44, 0.8)',
+                    font=dict(color='#FFD700')
+                )
+                st.plotly_chart(fig1, use_container_width=True)
         
         with col2:
-            if 'year' in df_clean.columns:
-                year_counts = df_clean['year'].value_counts().sort_index()
+            with timed('dakar_auto_stage_seconds', stage='chart_years', table=table_name):
+                years = year_counts(table_name, filters)
                 fig2 = px.line(
-                    x=year_counts.index,
-                    y=year_counts.values,
+                    x=years['year'],
+                    y=years['count'],
                     title="Vehicles by Year",
                     labels={'x': 'Year', 'y': 'Count'},
                     markers=True
@@ -554,28 +2552,86 @@ elif menu == " Dashboard":
                 )
                 st.plotly_chart(fig2, use_container_width=True)
         
-        if 'price' in df_clean.columns:
-            st.markdown("### Price Distribution")
-            try:
-                df_clean['price_numeric'] = df_clean['price'].str.replace(',', '').astype(float)
-                fig3 = px.histogram(
-                    df_clean,
-                    x='price_numeric',
-                    nbins=30,
+        with timed('dakar_auto_stage_seconds', stage='chart_areas', table=table_name):
+            areas = area_counts(table_name, 15, filters)
+            if len(areas) > 0:
+                labels = [f"{row.neighborhood}, {row.city}" if row.neighborhood else row.city
+                          for row in areas.itertuples()]
+                fig_areas = px.bar(
+                    x=areas['count'],
+                    y=labels,
+                    orientation='h',
+                    title="Listings by Area",
+                    labels={'x': 'Count', 'y': 'Area'},
+                    color=areas['avg_price'],
+                    color_continuous_scale='YlOrRd'
+                )
+                fig_areas.update_layout(
+                    yaxis={'categoryorder': 'total ascending'},
+                    coloraxis_colorbar={'title': 'Avg price'},
+                    plot_bgcolor='rgba(26, 32, 44, 0.8)',
+                    paper_bgcolor='rgba(26, 32, 44, 0.8)',
+                    font=dict(color='#FFD700')
+                )
+                st.plotly_chart(fig_areas, use_container_width=True)
+        
+        st.markdown("### Price Distribution")
+        col1, col2 = st.columns(2)
+        with col1:
+            bins = st.selectbox("Bins:", ["Auto", 10, 20, 30, 50, 100])
+        with col2:
+            clip = st.selectbox("Clip outliers:", list(PRICE_CLIP_OPTIONS))
+        with timed('dakar_auto_stage_seconds', stage='chart_prices', table=table_name):
+            hist, clipped = price_histogram(table_name, None if bins == "Auto" else bins, PRICE_CLIP_OPTIONS[clip], filters)
+            if len(hist) > 0:
+                fig3 = px.bar(
+                    x=(hist['start'] + hist['end']) / 2,
+                    y=hist['count'],
                     title="Price Distribution",
-                    labels={'price_numeric': 'Price (FCFA)'},
+                    labels={'x': 'Price (FCFA)', 'y': 'count'},
                     color_discrete_sequence=['#FFD700']
                 )
+                fig3.update_traces(width=hist['end'][0] - hist['start'][0])
                 fig3.update_layout(
+                    bargap=0,
                     plot_bgcolor='rgba(26, 32, 44, 0.8)',
                     paper_bgcolor='rgba(26, 32, 44, 0.8)',
                     font=dict(color='#FFD700')
                 )
                 st.plotly_chart(fig3, use_container_width=True)
-            except:
+                if clipped:
+                    st.caption(f"{clipped} listing(s) outside the clipped price range are not shown")
+            else:
                 st.warning(" Could not create price distribution chart")
+    elif filters:
+        st.warning(" No listings match the selected filters.")
     else:
         st.warning(" No data available. Please scrape some data first!")
+    
+    # Long-range history comes from the Parquet snapshots, reading only price and the chosen days
+    dates = snapshot_dates(table_name)
+    if dates:
+        st.markdown("### Price History")
+        if len(dates) > 1:
+            start, end = st.select_slider("Scrape dates:", options=dates, value=(dates[0], dates[-1]))
+        else:
+            start, end = dates[0], dates[0]
+        with timed('dakar_auto_stage_seconds', stage='chart_history', table=table_name):
+            history = snapshot_price_history(table_name, start, end)
+            fig4 = px.line(
+                x=history['scrape_date'],
+                y=history['median_price'],
+                title="Median Price per Scrape Date",
+                labels={'x': 'Scrape date', 'y': 'Median price (FCFA)'},
+                markers=True
+            )
+            fig4.update_traces(line_color='#FFD700', marker=dict(color='#FFD700', size=10))
+            fig4.update_layout(
+                plot_bgcolor='rgba(26, 32, 44, 0.8)',
+                paper_bgcolor='rgba(26, 32, 44, 0.8)',
+                font=dict(color='#FFD700')
+            )
+            st.plotly_chart(fig4, use_container_width=True)
 
 # VIEW DATA PAGE
 elif menu == " View Data":
@@ -587,10 +2643,12 @@ elif menu == " View Data":
     )
     
     table_map = {"Voitures": "voitures", "Motos": "motos", "Location": "location"}
-    df = load_from_db(table_map[data_type])
+    table_name = table_map[data_type]
+    filters = facet_filters(table_name, 'view', area_filter(table_name, 'view'))
+    total = count_rows(table_name, filters)
     
-    if len(df) > 0:
-        st.success(f"Found {len(df)} records in {data_type} table")
+    if total > 0:
+        st.success(f"Found {total} records in {data_type} table")
         
         col1, col2 = st.columns([3, 1])
         with col1:
@@ -599,28 +2657,182 @@ elif menu == " View Data":
             if st.button(" Clear Table"):
                 confirm = st.checkbox(" Confirm deletion")
                 if confirm:
-                    conn = sqlite3.connect('daka_auto.db')
-                    conn.execute(f"DELETE FROM {table_map[data_type]}")
-                    conn.commit()
-                    conn.close()
+                    clear_table(table_name)
                     st.success("Table cleared!")
                     st.rerun()
         
         if search:
-            mask = df.astype(str).apply(lambda x: x.str.contains(search, case=False)).any(axis=1)
-            df = df[mask]
+            df = search_listings(table_name, search, SEARCH_LIMIT, filters)
+            st.caption(f"{len(df)} best matches for '{search}'" + (f" (top {SEARCH_LIMIT})" if len(df) >= SEARCH_LIMIT else ""))
+        else:
+            columns = query_db(f"SELECT * FROM {table_name} LIMIT 0").columns
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                sort_column = st.selectbox(" Sort by:", [c for c in SORTABLE_COLUMNS if c in columns])
+            with col2:
+                descending = st.radio(" Order:", ["Ascending", "Descending"], horizontal=True) == "Descending"
+            with col3:
+                page_size = st.selectbox(" Rows per page:", PAGE_SIZES, index=1)
+            
+            # The stack holds the keyset cursor of every page before the current one
+            browse_key = (table_name, sort_column, descending, page_size, filters)
+            if st.session_state.get('browse_key') != browse_key:
+                st.session_state['browse_key'] = browse_key
+                st.session_state['browse_cursors'] = []
+            cursors = st.session_state['browse_cursors']
+            df = browse_table(table_name, sort_column, descending, page_size, cursors[-1] if cursors else None, filters)
+            
+            page_count = max(1, -(-total // page_size))
+            col1, col2, col3 = st.columns([1, 2, 1])
+            with col1:
+                if st.button(" Previous", disabled=not cursors, use_container_width=True):
+                    cursors.pop()
+                    st.rerun()
+            with col2:
+                st.markdown(f"<p style='text-align: center;'>Page {len(cursors) + 1} of {page_count}</p>", unsafe_allow_html=True)
+            with col3:
+                if st.button("Next ", disabled=len(df) < page_size, use_container_width=True):
+                    last = df.iloc[-1]
+                    value = last[sort_column]
+                    cursors.append((None if pd.isna(value) else value.item() if hasattr(value, 'item') else value, int(last['id'])))
+                    st.rerun()
         
         st.dataframe(df, use_container_width=True)
         
-        csv = df.to_csv(index=False).encode('utf-8')
+        # The export is only built when the button is clicked, on Streamlit's download thread
+        col1, col2 = st.columns([1, 3])
+        with col1:
+            export_format = st.selectbox("Export format:", list(EXPORT_FORMATS))
+        extension, mime = EXPORT_FORMATS[export_format]
+        with col2:
+            st.download_button(
+                label=f" Download {export_format}",
+                data=lambda: table_export(table_name, extension, filters, search),
+                file_name=f"{data_type}_{datetime.now().strftime('%Y%m%d')}.{extension}",
+                mime=mime
+            )
+        
+        counts = detail_counts(table_name)
+        if counts:
+            st.markdown("### Listing Details")
+            st.caption(", ".join(f"{count} {status}" for status, count in sorted(counts.items())))
+            col1, col2 = st.columns(2)
+            with col1:
+                if st.button(" Enrich pending listings", disabled=not counts.get('pending'), use_container_width=True):
+                    # A job with no pages to crawl: it only enriches, with its status and errors
+                    # recorded in the jobs table like any scrape
+                    job_id = submit_job(table_name, 0, DETAIL_MAX_IN_FLIGHT, enrich=True)
+                    st.success(f"Enrichment job #{job_id} started in the background. Follow it on the Scraper page.")
+            with col2:
+                if st.button(" Retry failed detail pages", disabled=not counts.get('failed'), use_container_width=True):
+                    retry_failed_details(table_name)
+                    st.rerun()
+            details = load_details(table_name)
+            if len(details) > 0:
+                st.dataframe(details, use_container_width=True, hide_index=True)
+    elif filters:
+        st.warning(" No listings match the selected filters.")
+    else:
+        st.warning(" No data available in this table. Please scrape some data first!")
+    
+    dates = snapshot_dates(table_name)
+    if dates:
+        st.markdown("---")
+        st.markdown("### Snapshot History")
+        st.caption(f"{len(dates)} scrape dates stored as Parquet, from {dates[0]} to {dates[-1]}")
+        if len(dates) > 1:
+            start, end = st.select_slider("Export scrape dates:", options=dates, value=(dates[0], dates[-1]))
+        else:
+            start, end = dates[0], dates[0]
         st.download_button(
-            label=" Download CSV",
-            data=csv,
-            file_name=f"{data_type}_{datetime.now().strftime('%Y%m%d')}.csv",
-            mime="text/csv"
+            label=" Download Parquet",
+            data=lambda: snapshot_parquet(table_name, start, end),
+            file_name=f"{data_type}_snapshots_{start:%Y%m%d}_{end:%Y%m%d}.parquet",
+            mime="application/octet-stream"
         )
+
+# PERFORMANCE PAGE
+elif menu == " Performance":
+    import plotly.express as px
+    st.markdown("## Performance")
+    st.markdown("""
+    <div style='color: #E2E8F0; margin-bottom: 20px;'>
+    <p>Timings and row counts collected since the app started, across all sessions and background jobs.</p>
+    </div>
+    """, unsafe_allow_html=True)
+    
+    latency, row_counts, histograms = metrics_frames()
+    if len(latency) > 0:
+        st.markdown("### Latency")
+        st.dataframe(latency, use_container_width=True, hide_index=True)
+        st.caption("Percentiles are estimated from the histogram buckets, as Prometheus does.")
+        
+        series_names = {
+            f"{name} {{{', '.join(f'{label}={value}' for label, value in labels)}}}": (name, labels)
+            for name, labels in sorted(histograms)
+        }
+        selected = st.selectbox("Latency distribution", list(series_names))
+        buckets = histograms[series_names[selected]]['buckets']
+        bounds = [f"≤ {bound * 1000:g} ms" for bound in LATENCY_BUCKETS] + [f"> {LATENCY_BUCKETS[-1] * 1000:g} ms"]
+        fig = px.bar(
+            x=bounds,
+            y=buckets,
+            title=selected,
+            labels={'x': 'Latency', 'y': 'Count'},
+            color_discrete_sequence=['#FFD700']
+        )
+        fig.update_layout(
+            plot_bgcolor='rgba(26, 32, 44, 0.8)',
+            paper_bgcolor='rgba(26, 32, 44, 0.8)',
+            font=dict(color='#FFD700')
+        )
+        st.plotly_chart(fig, use_container_width=True)
     else:
-        st.warning(" No data available in this table. Please scrape some data first!")
+        st.info("No measurements yet. Run a scrape or open the Dashboard first.")
+    
+    if len(row_counts) > 0:
+        st.markdown("### Row counts")
+        st.dataframe(row_counts, use_container_width=True, hide_index=True)
+    
+    st.markdown("### Storage")
+    col1, col2, col3 = st.columns(3)
+    for column, label, path in ((col1, "Database", DB_PATH), (col2, "Archive", ARCHIVE_PATH)):
+        with column:
+            size = os.path.getsize(path) if os.path.exists(path) else 0
+            st.metric(f" {label}", f"{size / 1024 / 1024:,.1f} MB")
+    with col3:
+        if st.button(" Run maintenance now", use_container_width=True):
+            try:
+                with st.spinner("Archiving, pruning and compacting..."):
+                    run_maintenance()
+            except Exception as e:
+                st.error(f" Error running maintenance: {str(e)}")
+    st.caption(f"Listings not seen for {RETENTION_DAYS} days move to the archive, finished jobs are kept "
+               f"{JOB_RETENTION_DAYS} days; maintenance runs every {MAINTENANCE_INTERVAL // 3600} hours.")
+    last_run = get_maintenance_state()['last_run']
+    if last_run:
+        st.json(last_run, expanded=False)
+    
+    st.markdown("---")
+    col1, col2 = st.columns(2)
+    with col1:
+        if st.button(" Reset metrics", use_container_width=True):
+            reset_metrics()
+            st.rerun()
+    with col2:
+        prometheus = prometheus_text()
+        st.download_button(
+            label="Download Prometheus metrics",
+            data=prometheus,
+            file_name="dakar_auto.prom",
+            mime="text/plain",
+            use_container_width=True
+        )
+    try:
+        write_metrics_file()
+        st.caption(f"Prometheus text file: {os.path.abspath(METRICS_PATH)} (rewritten every {METRICS_FLUSH_INTERVAL}s while the app is busy)")
+    except Exception as e:
+        st.error(f" Error writing metrics file: {str(e)}")
 
 # WEB EVALUATION APP PAGE
 elif menu == " Web Evaluation App":
@@ -0,0 +1,109 @@
+# Migrating a database written by the original app must only collapse repeated copies
+# of a card, never distinct listings. Run with: python -m pytest -q
+import logging
+import os
+import sqlite3
+import sys
+import tempfile
+
+WORKDIR = tempfile.mkdtemp(prefix='dakar_auto_test_')
+os.environ['DAKAR_AUTO_DB'] = os.path.join(WORKDIR, 'app.db')
+os.environ['DAKAR_AUTO_CACHE'] = os.path.join(WORKDIR, 'http_cache')
+os.environ['DAKAR_AUTO_METRICS'] = os.path.join(WORKDIR, 'dakar_auto.prom')
+os.environ['DAKAR_AUTO_SNAPSHOTS'] = os.path.join(WORKDIR, 'snapshots')
+os.environ['DAKAR_AUTO_ARCHIVE'] = os.path.join(WORKDIR, 'archive.db')
+os.environ['DAKAR_AUTO_RESULT_CACHE_MB'] = '0'
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+
+logging.disable(logging.WARNING)
+import my_data_app as app
+
+# Tables as the original app created them, before any migration
+BASELINE_SCHEMAS = {
+    'voitures': '''CREATE TABLE voitures
+                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                  brand TEXT, model TEXT, year TEXT, kilometer TEXT,
+                  fuel_type TEXT, gearbox TEXT, adress TEXT,
+                  owner TEXT, price TEXT, scraped_date TEXT)''',
+    'motos': '''CREATE TABLE motos
+                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                  brand TEXT, year TEXT, kilometer TEXT,
+                  adress TEXT, owner TEXT, price TEXT, scraped_date TEXT)''',
+    'location': '''CREATE TABLE location
+                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                  brand TEXT, year TEXT, adress TEXT,
+                  owner TEXT, price TEXT, scraped_date TEXT)''',
+}
+
+def baseline_rows(category):
+    # The bundled export as the original scrapers stored it: the title split into brand
+    # (and model for voitures) and year, "Par" stripped, prices compacted to digits
+    raw = pd.read_csv(os.path.join(app.DATA_DIR, app.BUNDLED_EXPORTS[category]), encoding='utf-8-sig', dtype=str)
+    title = raw['brand_year'].str.strip().str.split()
+    rows = pd.DataFrame({'brand': title.str[0]})
+    if category == 'voitures':
+        rows['model'] = title.str[1:-1].str.join(' ')
+    rows['year'] = title.str[-1]
+    if category == 'voitures':
+        rows['kilometer'] = raw['kms'].str.replace('km', '').str.strip()
+        rows['fuel_type'] = raw['fuel'].str.strip()
+        rows['gearbox'] = raw['geabox'].str.strip()
+    elif category == 'motos':
+        rows['kilometer'] = '0'
+    rows['adress'] = raw['adress' if category == 'voitures' else 'address'].str.strip()
+    rows['owner'] = raw['owner'].str.replace('Par', '').str.strip()
+    rows['price'] = raw['price'].map(lambda price: "".join(price.split()).replace('FCFA', ''))
+    return rows
+
+def build_baseline_db(path):
+    conn = sqlite3.connect(path)
+    expected = {}
+    for category, schema in BASELINE_SCHEMAS.items():
+        conn.execute(schema)
+        rows = baseline_rows(category)
+        # Two scrape runs appending the same cards, as the original save_to_db did
+        for scraped_date in ('2025-01-01 10:00:00', '2025-01-02 10:00:00'):
+            rows.assign(scraped_date=scraped_date).to_sql(category, conn, if_exists='append', index=False)
+        expected[category] = len(rows.drop_duplicates())
+    conn.commit()
+    return conn, expected
+
+def test_migration_keeps_distinct_listings():
+    conn, expected = build_baseline_db(os.path.join(WORKDIR, 'baseline.db'))
+    app.migrate_db(conn)
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == app.SCHEMA_VERSION
+    for category, count in expected.items():
+        rows, keys = conn.execute(f"SELECT COUNT(*), COUNT(DISTINCT listing_key) FROM {category}").fetchone()
+        assert rows == count, category
+        assert keys == count, category
+        first_seen, last_seen = conn.execute(f"SELECT MIN(first_seen), MAX(last_seen) FROM {category}").fetchone()
+        assert (first_seen, last_seen) == ('2025-01-01 10:00:00', '2025-01-02 10:00:00')
+    conn.close()
+
+def test_migration_keeps_same_title_at_other_price():
+    # Two cards of one dealer that the old schema stores identically but for the price
+    conn = sqlite3.connect(os.path.join(WORKDIR, 'prices.db'))
+    for schema in BASELINE_SCHEMAS.values():
+        conn.execute(schema)
+    conn.executemany(
+        "INSERT INTO motos (brand, year, kilometer, adress, owner, price, scraped_date) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        [('BMW', '2020', '0', None, 'DS Bikers Coffee', '5900000', '2025-01-01 10:00:00'),
+         ('BMW', '2020', '0', None, 'DS Bikers Coffee', '5500000', '2025-01-01 10:00:00'),
+         ('BMW', '2020', '0', None, 'DS Bikers Coffee', '5900000', '2025-01-02 10:00:00')]
+    )
+    conn.commit()
+    app.migrate_db(conn)
+    prices = sorted(price for price, in conn.execute("SELECT price FROM motos"))
+    assert prices == [5500000, 5900000]
+    conn.close()
+
+def test_bundled_exports_keep_every_title():
+    for category in app.BUNDLED_EXPORTS:
+        df = app.load_bundled_export(category)
+        assert df['listing_key'].is_unique
+        raw = pd.read_csv(os.path.join(app.DATA_DIR, app.BUNDLED_EXPORTS[category]), encoding='utf-8-sig', dtype=str)
+        titles = set(raw['brand_year'].str.split().str.join(' '))
+        kept = set((df['brand'] + ' ' + df['model'] + ' ' + df['year'].astype('string')).str.split().str.join(' '))
+        assert titles == kept, category